@@ -0,0 +1,164 @@
+"""Microbenchmarks for the toon.anim engine.
+
+Covers `Track.at` and `Track.at_many` with many keyframes (sequential playback vs. random seeking),
+array-valued tracks vs. one track per component, all easing functions (per call,
+and over a large array with `easing.ease`), LERP vs. SELECT vs. splines,
+and `Player.advance` with 1 to 10,000 tracks driving string attributes, methods, callbacks,
+lists of objects, or rows of a bound array.
+
+Per-call times are reported in nanoseconds. `Player.advance` is also checked against
+a share of the frame budget (see `--frame-rate` and `--budget`).
+
+Usage:
+
+    python benchmarks/bench_anim.py -o new.json
+    python benchmarks/bench_anim.py -o new.json -b old.json  # flag regressions vs. old.json
+"""
+from time import perf_counter_ns
+
+import numpy as np
+
+from harness import check, finish, load_baseline, parser, summarize
+from toon.anim import Player, Track
+from toon.anim import easing
+from toon.anim.interpolators import LERP, SELECT, CATMULL_ROM, MONOTONE_CUBIC, CUBIC_SPLINE
+
+easing_names = ['LINEAR', 'STEP', 'SMOOTHSTEP', 'SMOOTHERSTEP',
+                'QUADRATIC_IN', 'QUADRATIC_OUT', 'QUADRATIC_IN_OUT',
+                'EXPONENTIAL_IN', 'EXPONENTIAL_OUT', 'EXPONENTIAL_IN_OUT',
+                'ELASTIC_IN', 'ELASTIC_OUT', 'ELASTIC_IN_OUT',
+                'BACK_IN', 'BACK_OUT', 'BACK_IN_OUT',
+                'BOUNCE_IN', 'BOUNCE_OUT', 'BOUNCE_IN_OUT']
+
+
+class Obj(object):
+    def __init__(self):
+        self.x = 0
+
+    def set_x(self, val):
+        self.x = val
+
+
+def callback(val, obj):
+    obj.x = val
+
+
+def time_calls(fn, args, repeats=7):
+    """Call `fn` on each element of `args`, `repeats` times.
+    Returns the per-call time (ns) of each repeat."""
+    out = []
+    for r in range(repeats):
+        t0 = perf_counter_ns()
+        for a in args:
+            fn(a)
+        out.append((perf_counter_ns() - t0) / len(args))
+    return out
+
+
+def time_batch(fn, arr, repeats=7):
+    """Call `fn` once on the whole array, `repeats` times.
+    Returns the time (ns) per element of each repeat."""
+    out = []
+    for r in range(repeats):
+        t0 = perf_counter_ns()
+        fn(arr)
+        out.append((perf_counter_ns() - t0) / len(arr))
+    return out
+
+
+def keyframes(n, duration=10.0):
+    times = np.linspace(0, duration, n)
+    return list(zip(times, np.sin(times)))
+
+
+def bench_track(n_calls):
+    rng = np.random.default_rng(1)
+    for n in [10, 100, 1000, 10000]:
+        for order in ['sequential', 'random']:
+            trk = Track(keyframes(n))
+            times = np.linspace(0, 10, n_calls)
+            if order == 'random':
+                rng.shuffle(times)
+            yield {'bench': 'track_at', 'keyframes': n, 'order': order}, time_calls(trk.at, times.tolist())
+            yield ({'bench': 'track_at_many', 'keyframes': n, 'order': order},
+                   time_batch(trk.at_many, times))
+    times = np.linspace(0, 10, n_calls).tolist()
+    # one array-valued track vs. one track per component
+    kfs = keyframes(100)
+    out = np.empty(3)
+    trk = Track([(t, (v, v, v)) for t, v in kfs])
+    yield {'bench': 'components', 'tracks': 1}, time_calls(lambda t: trk.at(t, out), times)
+    trks = [Track(kfs) for i in range(3)]
+    yield ({'bench': 'components', 'tracks': 3},
+           time_calls(lambda t: [trk.at(t) for trk in trks], times))
+    for inter, name in [(LERP, 'LERP'), (SELECT, 'SELECT'), (CATMULL_ROM, 'CATMULL_ROM'),
+                        (MONOTONE_CUBIC, 'MONOTONE_CUBIC'), (CUBIC_SPLINE, 'CUBIC_SPLINE')]:
+        trk = Track(keyframes(100), interpolator=inter)
+        yield {'bench': 'interpolator', 'interpolator': name}, time_calls(trk.at, times)
+    points = np.linspace(0, 1, 50 * n_calls)
+    buf = np.empty_like(points)
+    for name in easing_names:
+        trk = Track(keyframes(100), easing=getattr(easing, name))
+        yield {'bench': 'easing', 'easing': name}, time_calls(trk.at, times)
+        fn = getattr(easing, name)
+        yield ({'bench': 'ease_array', 'easing': name},
+               time_batch(lambda x: easing.ease(x, fn, out=buf), points))
+
+
+def bench_player(n_calls):
+    for n_tracks in [1, 10, 100, 1000, 10000]:
+        for target in ['attribute', 'method', 'callback', 'list', 'array']:
+            player = Player()
+            trk = Track([(0, 0), (1e6, 1e6)])  # long enough to never finish
+            if target == 'array':
+                player.bind_array(np.zeros((n_tracks, 2), dtype=np.float32))
+                trk = Track([(0, (0, 0)), (1e6, (1e6, 1e6))])
+            for i in range(n_tracks):
+                if target == 'attribute':
+                    player.add(trk, 'x', Obj())
+                elif target == 'method':
+                    obj = Obj()
+                    player.add(trk, obj.set_x, obj)
+                elif target == 'callback':
+                    player.add(trk, callback, Obj())
+                elif target == 'array':
+                    player.add_slot(trk, i)
+                else:
+                    player.add(trk, 'x', [Obj() for j in range(4)])
+            player.start(0)
+            # fewer frames for bigger players, so each case takes about the same time
+            frames = max(n_calls // n_tracks, 20)
+            times = np.arange(1, frames + 1) * (1.0 / 60)
+            yield ({'bench': 'player_advance', 'tracks': n_tracks, 'target': target},
+                   time_calls(player.advance, times.tolist(), repeats=5))
+
+
+def name_of(params):
+    return ','.join('%s=%s' % (k, v) for k, v in params.items())
+
+
+if __name__ == '__main__':
+    p = parser(__doc__.splitlines()[0])
+    p.add_argument('--frame-rate', type=float, default=60.0, help='display refresh rate (Hz)')
+    p.add_argument('--budget', type=float, default=0.2,
+                   help='share of a frame that Player.advance may use (for <= 1000 tracks)')
+    args = p.parse_args()
+    n_calls = 2000 if args.quick else 20000
+    frame_ns = 1e9 / args.frame_rate
+
+    results = []
+    for gen in [bench_track(n_calls), bench_player(n_calls)]:
+        for params, per_call in gen:
+            stat = summarize(per_call)
+            metrics = {'per_call_ns': stat['p50'], 'worst_ns': stat['max']}
+            if params['bench'] == 'player_advance':
+                metrics['frame_share'] = stat['p50'] / frame_ns
+            name = name_of(params)
+            print('%-60s %12.1f ns/call' % (name, metrics['per_call_ns']))
+            results.append({'name': name, 'params': params, 'metrics': metrics})
+
+    directions = {'per_call_ns': 'lower', 'frame_share': 'lower'}
+    thresholds = {'frame_share': lambda p: args.budget if p['tracks'] <= 1000 else None}
+    failures = check(results, thresholds, directions,
+                     load_baseline(args.baseline), args.tolerance)
+    finish('anim', results, failures, args)
@@ -0,0 +1,190 @@
+"""Benchmarks for the toon.input transport (MpDevice).
+
+Sweeps observation shape, device rate, ctype, struct vs. scalar data, list vs. single
+returns and `use_views`, one factor at a time around a base case (or the full grid with `--full`).
+For each case, we measure:
+
+- Latency of `MpDevice.read()` at a typical frame cadence (percentiles, microseconds).
+- Producer throughput (observations committed per second; rate=0 means saturation).
+- CPU usage of the child process (percent of one core).
+- Drop rate (fraction of observations overwritten before being read).
+
+Separately, we time `MpDevice.read()` when there is no new data (the common case
+when polling faster than the device), which should stay well under a microsecond.
+
+Usage:
+
+    python benchmarks/bench_input.py -o new.json
+    python benchmarks/bench_input.py -o new.json -b old.json  # flag regressions vs. old.json
+"""
+import ctypes
+import itertools
+from time import perf_counter, perf_counter_ns, sleep
+
+import numpy as np
+import psutil
+
+from harness import check, finish, load_baseline, parser, summarize
+from toon.input import BaseDevice, MpDevice
+
+
+class Pair(ctypes.Structure):
+    _fields_ = [('x', ctypes.c_double), ('y', ctypes.c_double)]
+
+
+class BenchDevice(BaseDevice):
+    """Produces constant data at a fixed rate (or as fast as possible, if rate is 0)."""
+
+    def __init__(self, shape=(1,), ctype='c_double', rate=1000, batch=0, struct=False, **kwargs):
+        super(BenchDevice, self).__init__(**kwargs)
+        self.shape = (1,) if struct else tuple(shape)
+        self.ctype = Pair if struct else getattr(ctypes, ctype)
+        # size the buffer for 1 s of data
+        self.sampling_frequency = (rate if rate else 10000) * max(batch, 1)
+        self.rate = rate
+        self.batch = batch
+        self.struct = struct
+
+    def enter(self):
+        if self.struct:
+            self._data = Pair(1.0, 2.0)
+        else:
+            self._data = np.ones(self.shape, dtype=self.ctype)
+        self._period = 1.0 / self.rate if self.rate else 0
+        self._next = perf_counter()
+
+    def read(self):
+        if self._period:
+            while perf_counter() < self._next:
+                pass
+            self._next += self._period
+        t = self.clock()
+        if self.batch:
+            return [(t, self._data)] * self.batch
+        return t, self._data
+
+
+class EmptyDevice(BaseDevice):
+    """Never produces data."""
+    shape = (3,)
+    ctype = ctypes.c_double
+
+    def read(self):
+        sleep(0.001)  # don't hog a core
+        return None
+
+
+base = {'shape': (3,), 'rate': 1000, 'ctype': 'c_double',
+        'struct': False, 'batch': 0, 'use_views': False}
+sweeps = {'shape': [(1,), (10,), (100,), (1000,)],
+          'rate': [0, 100, 1000, 10000],
+          'ctype': ['c_double', 'c_float', 'c_int32', 'c_uint8'],
+          'struct': [False, True],
+          'batch': [0, 5],
+          'use_views': [False, True]}
+
+# read_max_us is recorded but too noisy to compare between runs
+directions = {'read_p50_us': 'lower', 'read_p99_us': 'lower',
+              'throughput': 'higher', 'child_cpu': 'lower', 'drop_rate': 'lower',
+              'empty_read_ns': 'lower'}
+thresholds = {
+    # the README promises reads below 500 us
+    'read_p99_us': lambda p: 500,
+    # nothing should be lost when the buffer is sized for 1 s and we read at 60 Hz
+    'drop_rate': lambda p: 0.0 if p['rate'] else None,
+    'throughput': lambda p: 0.9 * p['rate'] * max(p['batch'], 1) if p['rate'] else None,
+    'empty_read_ns': lambda p: 1000,
+}
+
+
+def cases(full=False):
+    if full:
+        keys = list(sweeps)
+        for vals in itertools.product(*(sweeps[k] for k in keys)):
+            yield dict(zip(keys, vals))
+        return
+    seen = set()
+    for key, vals in sweeps.items():
+        for v in vals:
+            params = dict(base, **{key: v})
+            ident = tuple(sorted(params.items()))
+            if ident not in seen:
+                seen.add(ident)
+                yield params
+
+
+def name_of(params):
+    return ','.join('%s=%s' % (k, 'x'.join(map(str, v)) if isinstance(v, tuple) else v)
+                    for k, v in sorted(params.items()))
+
+
+def run_case(params, duration, read_rate=60):
+    dev = MpDevice(BenchDevice(shape=params['shape'], ctype=params['ctype'],
+                               rate=params['rate'], batch=params['batch'],
+                               struct=params['struct']),
+                   use_views=params['use_views'])
+    read_times = []
+    received = 0
+    with dev:
+        child = psutil.Process(dev.process.pid)
+        dev.read()  # discard warm-up data
+        dev.reset_stats()
+        cpu0 = sum(child.cpu_times()[:2])
+        t_start = perf_counter()
+        t_end = t_start + duration
+        while perf_counter() < t_end:
+            t0 = perf_counter()
+            res = dev.read()
+            read_times.append(perf_counter() - t0)
+            if res is not None:
+                received += res.time.shape[0]
+            sleep(1.0 / read_rate)
+        elapsed = perf_counter() - t_start
+        cpu = sum(child.cpu_times()[:2]) - cpu0
+        st = dev.stats
+    lat = summarize(read_times, 1e6)
+    return {'read_p50_us': lat['p50'], 'read_p99_us': lat['p99'], 'read_max_us': lat['max'],
+            'throughput': st.samples / elapsed, 'received': received / elapsed,
+            'child_cpu': 100.0 * cpu / elapsed,
+            'drop_rate': st.dropped / st.samples if st.samples else 0.0}
+
+
+def run_empty(n_batches, batch=1000):
+    """Per-call time (ns) of `read()` with no pending data, median over batches of calls
+    (so that the occasional preemption doesn't dominate)."""
+    dev = MpDevice(EmptyDevice())
+    per_call = []
+    with dev:
+        read = dev.read
+        for i in range(n_batches):
+            t0 = perf_counter_ns()
+            for j in range(batch):
+                read()
+            per_call.append((perf_counter_ns() - t0) / batch)
+    return {'empty_read_ns': summarize(per_call)['p50']}
+
+
+if __name__ == '__main__':
+    p = parser(__doc__.splitlines()[0])
+    p.add_argument('--full', action='store_true', help='run the full grid instead of one-at-a-time sweeps')
+    p.add_argument('-d', '--duration', type=float, default=2.0, help='seconds per case')
+    args = p.parse_args()
+    duration = 0.5 if args.quick else args.duration
+
+    results = []
+    for params in cases(args.full):
+        metrics = run_case(params, duration)
+        name = name_of(params)
+        print('%-90s p50 %7.1f us  p99 %7.1f us  %9.0f obs/s  cpu %5.1f%%  drop %.3f' %
+              (name, metrics['read_p50_us'], metrics['read_p99_us'], metrics['throughput'],
+               metrics['child_cpu'], metrics['drop_rate']))
+        params = dict(params, shape=list(params['shape']))
+        results.append({'name': name, 'params': params, 'metrics': metrics})
+
+    metrics = run_empty(20 if args.quick else 200)
+    print('%-90s %7.1f ns' % ('empty_read', metrics['empty_read_ns']))
+    results.append({'name': 'empty_read', 'params': {}, 'metrics': metrics})
+
+    failures = check(results, thresholds, directions,
+                     load_baseline(args.baseline), args.tolerance)
+    finish('input', results, failures, args)
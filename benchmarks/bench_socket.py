@@ -0,0 +1,125 @@
+"""Benchmarks for `SocketDevice` (UDP packets received through an MpDevice).
+
+A separate process sends fixed-size packets over loopback at a range of rates, and
+we read them through an MpDevice at a typical frame cadence. For each rate, we measure:
+
+- Sustained receive rate (packets per second that made it to `read()`).
+- Loss (fraction of packets sent that never arrived, either in the kernel or the shared buffer).
+- CPU usage of the child process (percent of one core).
+
+Usage:
+
+    python benchmarks/bench_socket.py -o new.json
+    python benchmarks/bench_socket.py -o new.json -b old.json  # flag regressions vs. old.json
+"""
+import ctypes
+import multiprocessing as mp
+import socket
+from time import perf_counter, sleep
+
+import numpy as np
+import psutil
+
+from harness import check, finish, load_baseline, parser
+from toon.input import MpDevice, SocketDevice
+
+# e.g. one rigid body from a motion capture system
+packet = np.dtype([('frame', '<u4'), ('pos', '<f4', (3,)), ('quat', '<f4', (4,))])
+
+
+class Receiver(SocketDevice):
+    ctype = ctypes.c_double
+    shape = (8,)
+    packet_dtype = packet
+
+    def __init__(self, rate, **kwargs):
+        super(Receiver, self).__init__(**kwargs)
+        self.sampling_frequency = rate  # 1 s of buffer
+
+    def decode(self, packets):
+        out = np.empty((packets.shape[0], 8))
+        out[:, 0] = packets['frame']
+        out[:, 1:4] = packets['pos']
+        out[:, 4:] = packets['quat']
+        return out
+
+
+def send(address, rate, duration, go):
+    """Send `rate` packets per second for `duration` seconds, in 1 ms bursts."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    pkts = np.zeros(int(rate * duration), dtype=packet)
+    pkts['frame'] = np.arange(pkts.shape[0])
+    raw = [p.tobytes() for p in pkts]
+    go.wait()
+    t0 = perf_counter()
+    sent = 0
+    while sent < len(raw):
+        due = min(int((perf_counter() - t0) * rate) + 1, len(raw))
+        for i in range(sent, due):
+            sock.sendto(raw[i], address)
+        sent = due
+        sleep(0.001)
+    sock.close()
+
+
+def free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def run_case(rate, duration, read_rate=60):
+    address = ('127.0.0.1', free_port())
+    go = mp.Event()
+    sender = mp.Process(target=send, args=(address, rate, duration, go), daemon=True)
+    sender.start()
+    frames = []
+    dev = MpDevice(Receiver(rate, address=address))
+    with dev:
+        child = psutil.Process(dev.process.pid)
+        cpu0 = sum(child.cpu_times()[:2])
+        t_start = perf_counter()
+        go.set()
+        while sender.is_alive() or perf_counter() - t_start < duration:
+            res = dev.read()
+            if res is not None:
+                frames.append(res.data[:, 0])
+            sleep(1.0 / read_rate)
+        sleep(0.1)  # stragglers
+        res = dev.read()
+        if res is not None:
+            frames.append(res.data[:, 0])
+        elapsed = perf_counter() - t_start
+        cpu = sum(child.cpu_times()[:2]) - cpu0
+    sender.join()
+    sent = int(rate * duration)
+    received = np.unique(np.concatenate(frames)).size if frames else 0
+    return {'received': received / duration, 'loss': 1.0 - received / sent,
+            'child_cpu': 100.0 * cpu / elapsed}
+
+
+directions = {'received': 'higher', 'loss': 'lower', 'child_cpu': 'lower'}
+thresholds = {
+    'received': lambda p: 0.8 * p['rate'],
+    'loss': lambda p: 0.01,
+}
+
+if __name__ == '__main__':
+    p = parser(__doc__.splitlines()[0])
+    p.add_argument('-d', '--duration', type=float, default=2.0, help='seconds per rate')
+    p.add_argument('-r', '--rates', type=int, nargs='+', default=[1000, 10000, 50000],
+                   help='packets per second to send')
+    args = p.parse_args()
+    duration = 0.5 if args.quick else args.duration
+
+    results = []
+    for rate in args.rates:
+        metrics = run_case(rate, duration)
+        name = 'udp,rate=%i' % rate
+        print('%-30s %9.0f pkt/s  loss %.4f  cpu %5.1f%%' %
+              (name, metrics['received'], metrics['loss'], metrics['child_cpu']))
+        results.append({'name': name, 'params': {'rate': rate}, 'metrics': metrics})
+
+    failures = check(results, thresholds, directions,
+                     load_baseline(args.baseline), args.tolerance)
+    finish('socket', results, failures, args)
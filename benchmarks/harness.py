@@ -0,0 +1,109 @@
+"""Shared helpers for the benchmark scripts in this folder.
+
+Each script produces a list of results (name, params, metrics), writes them
+to a JSON file, and checks the metrics against absolute thresholds and
+(optionally) against a previous run.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+
+
+def summarize(samples, scale=1.0):
+    """Percentiles of a 1D sequence of measurements, multiplied by `scale`."""
+    samples = np.asarray(samples, dtype=np.float64) * scale
+    if samples.size == 0:
+        return {'n': 0}
+    p50, p90, p99 = np.percentile(samples, [50, 90, 99])
+    return {'n': int(samples.size), 'mean': float(np.mean(samples)),
+            'p50': float(p50), 'p90': float(p90), 'p99': float(p99),
+            'max': float(np.max(samples))}
+
+
+def machine_info():
+    import toon
+    return {'python': platform.python_version(),
+            'platform': platform.platform(),
+            'processor': platform.processor(),
+            'cpu_count': os.cpu_count(),
+            'numpy': np.__version__,
+            'toon': getattr(toon, '__version__', None)}
+
+
+def parser(description):
+    p = argparse.ArgumentParser(description=description)
+    p.add_argument('-o', '--output', help='write results to this JSON file')
+    p.add_argument('-b', '--baseline', help='compare against the results in this JSON file')
+    p.add_argument('-t', '--tolerance', type=float, default=0.5,
+                   help='relative slowdown vs. the baseline that counts as a regression')
+    p.add_argument('-q', '--quick', action='store_true', help='shorter runs')
+    return p
+
+
+def check(results, thresholds, directions, baseline=None, tolerance=0.5):
+    """Find metrics that exceed their threshold or regressed relative to a baseline.
+
+    Parameters
+    ----------
+    results: list of dict
+        Each has 'name', 'params' and 'metrics' (a flat dict of numbers).
+    thresholds: dict
+        Maps metric name to a callable taking the result's params and returning a limit
+        (or None for no limit).
+    directions: dict
+        Maps metric name to 'lower' or 'higher' (which direction is better).
+    baseline: list of dict, optional
+        Results of a previous run.
+    tolerance: float
+        Allowed relative change in the bad direction before flagging a regression.
+
+    Returns
+    -------
+    List of human-readable failure messages.
+    """
+    failures = []
+    old = {r['name']: r['metrics'] for r in (baseline or [])}
+    for res in results:
+        name = res['name']
+        for metric, value in res['metrics'].items():
+            direction = directions.get(metric)
+            if direction is None:
+                continue
+            limit = thresholds[metric](res['params']) if metric in thresholds else None
+            if limit is not None:
+                bad = value > limit if direction == 'lower' else value < limit
+                if bad:
+                    failures.append('%s: %s = %.4g (limit %.4g)' % (name, metric, value, limit))
+            prev = old.get(name, {}).get(metric)
+            if prev:
+                change = (value - prev) / abs(prev)
+                if direction == 'higher':
+                    change = -change
+                if change > tolerance:
+                    failures.append('%s: %s = %.4g (baseline %.4g, %+.0f%%)' %
+                                    (name, metric, value, prev, 100 * change))
+    return failures
+
+
+def finish(suite, results, failures, args):
+    """Write results to disk (if requested), print failures, and exit non-zero on regressions."""
+    out = {'suite': suite, 'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+           'machine': machine_info(), 'results': results, 'failures': failures}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(out, f, indent=2)
+    for fail in failures:
+        print('REGRESSION %s' % fail)
+    sys.exit(1 if failures else 0)
+
+
+def load_baseline(path):
+    if not path:
+        return None
+    with open(path) as f:
+        return json.load(f)['results']
@@ -7,6 +7,7 @@ import serial
 from serial.tools import list_ports
 
 from toon.input.device import BaseDevice
+from toon.input.framing import FrameReader, backdate
 
 # reference (most recent):
 # https://github.com/aforren1/toon/blob/455d06827082ae30ec4ae3b2605185cb4d291c92/toon/input/birds.py
@@ -25,12 +26,14 @@ class BirdData(Structure):
 class Birds(BaseDevice):
     shape = (1,)
     ctype = BirdData
+    sampling_frequency = 130
 
     def __init__(self, **kwargs):
         self._birds = None
         self._master = None
         self.indices = [1, 3]
         self.read_from = []
+        self.readers = []
         self.cos_const = np.cos(-0.01938)
         self.sin_const = np.sin(0.01938)
         super(Birds, self).__init__(**kwargs)
@@ -70,13 +73,16 @@ class Birds(BaseDevice):
             if self.indices and res in self.indices:
                 self.read_from.append(b)
         self.read_from.reverse()  # TODO: fix it up so that read_from is in order of bird indices
+        # position frames are 3 words; only the first byte has the high bit set
+        self.readers = [FrameReader(6, sync=0x80, sync_mask=0x80, exclusive=True)
+                        for b in self.read_from]
         # init master, FBB autoconfig
         time.sleep(1)
         self._master.write(('P' + chr(0x32) + chr(len(devices))).encode('utf-8'))
         time.sleep(3)
 
         # set the sampling frequency
-        self._master.write(b'P' + b'\x07' + struct.pack('<H', int(130 * 256)))
+        self._master.write(b'P' + b'\x07' + struct.pack('<H', int(self.sampling_frequency * 256)))
         # check the sampling frequency
         # self._master.write(b'\x4F' + b'\x07')
         # time.sleep(0.1)
@@ -97,27 +103,28 @@ class Birds(BaseDevice):
             b.write(b'@')
 
     def read(self):
-        lst = []
-        # busy wait until first byte available
-        while not self.read_from[0].in_waiting:
-            pass
+        # drain everything available, then use the frames we have from every bird
+        for reader, bird in zip(self.readers, self.read_from):
+            reader.fill(bird)
+        n = min([reader.available() for reader in self.readers])
+        if not n:
+            return None
         time = self.clock()
-        for bird in self.read_from:
-            lst.append(bird.read(6))  # assumes position data
-        lst = [decode(msg) for msg in lst]
-        data = np.array(lst).reshape((6,))  # position data for two birds
-        data[:] = data[[1, 2, 0, 4, 5, 3]]  # fiddle with order of axes
+        # position data for two birds, one row per sample
+        data = np.hstack([decode(reader.take(n)) for reader in self.readers])
+        data[:] = data[:, [1, 2, 0, 4, 5, 3]]  # fiddle with order of axes
         # rotate
-        tmp_x = data[::3]
-        tmp_y = data[1::3]
-        data[::3] = tmp_x * self.cos_const - tmp_y * self.sin_const
-        data[1::3] = tmp_y * self.sin_const + tmp_y * self.cos_const
+        tmp_x = data[:, ::3]
+        tmp_y = data[:, 1::3]
+        data[:, ::3] = tmp_x * self.cos_const - tmp_y * self.sin_const
+        data[:, 1::3] = tmp_y * self.sin_const + tmp_y * self.cos_const
 
         # translate to the lower left corner
-        data[::3] += 61.35
-        data[1::3] += 17.69
-        out = BirdData(left=Point3D(*data[0:3]), right=Point3D(*data[3:6]))
-        return time, out
+        data[:, ::3] += 61.35
+        data[:, 1::3] += 17.69
+        out = np.empty(n, dtype=BirdData)
+        out.view(np.float64).reshape((n, 6))[:] = data
+        return backdate(time, n, 1.0 / self.sampling_frequency), out
 
     def exit(self):
         for bird in self.read_from:
@@ -129,23 +136,13 @@ class Birds(BaseDevice):
             bird.close()
 
 
-def decode(msg, n_words=3):
-    return [decode_words(msg, i) for i in range(int(n_words))]
-
-
-def decode_words(s, i):
-    v = decode_word(s[2*i:2*i + 2])
-    v *= 36 * 2.54  # scaling to cm
-    return v / 32768.0
-
-
-def decode_word(msg):
-    lsb = msg[0] & 0x7f
-    msb = msg[1]
-    v = (msb << 9) | (lsb << 2)
-    if v < 0x8000:
-        return v
-    return v - 0x10000
+def decode(frames):
+    """Positions (cm) from an (n, 2 * n_words) array of frames.
+    Each word is 7 bits of the first byte (lsb) and 7 of the second (msb)."""
+    lsb = (frames[:, 0::2] & 0x7f).astype(np.uint16)
+    msb = frames[:, 1::2].astype(np.uint16)
+    v = ((msb << 9) | (lsb << 2)).view(np.int16)  # signed 16-bit
+    return v * (36 * 2.54 / 32768.0)  # scaling to cm
 
 
 if __name__ == '__main__':
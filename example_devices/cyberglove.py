@@ -1,9 +1,9 @@
 import ctypes
-import struct
 import serial
 import numpy as np
 from time import sleep
 from toon.input.device import BaseDevice
+from toon.input.framing import FrameReader, backdate
 from serial.tools import list_ports
 
 # thanks to ROS http://docs.ros.org/fuerte/api/cyberglove/html/serial__glove_8hpp.html
@@ -39,8 +39,12 @@ class GloveData(ctypes.Structure):
     _fields_.append(('wrist', WristData))
 
 
+# sensor order in GloveData (data[3] is index abduction)
+glove_order = [0, 1, 2, 4, 5, 3] + list(range(6, 18))
+
+
 class Cyberglove(BaseDevice):
-    sampling_frequency = 150
+    sampling_frequency = 100
     shape = (1, 1)
     ctype = GloveData
 
@@ -48,6 +52,8 @@ class Cyberglove(BaseDevice):
         super(Cyberglove, self).__init__(**kwargs)
         self.port = port  # TODO: auto-detect using serial.tools.list_ports
         self.dev = None
+        # 'S', 18 sensors, '\x00'
+        self.reader = FrameReader(20, sync=ord('S'))
 
     def enter(self):
         if not self.port:
@@ -61,7 +67,8 @@ class Cyberglove(BaseDevice):
         if not self.dev.read():
             raise RuntimeError('Make sure the device is switched on.')
         self.dev.write(b'f 0\r')  # stop filtering
-        self.dev.write(b't 1152 1\r')  # 100 Hz
+        # sample period, in units of 1/115200 s
+        self.dev.write(b't %i 1\r' % (115200 // self.sampling_frequency))
         self.dev.write(b'u 0\r')  # don't transmit status
         self.dev.write(b'l 1\r')  # light on
         sleep(0.1)
@@ -77,26 +84,19 @@ class Cyberglove(BaseDevice):
                 break
         if i >= 39:
             raise RuntimeError('Did not find the start byte.')
+        self.reader.clear()
 
     def read(self):
-        # one byte (S)
-        val = self.dev.read(1)
-        time = self.clock()
-        if val:
-            data = self.dev.read(19)  # read remaining bytes ('18 sensors + \x00')
-            data = struct.unpack('<' + 'B' * 18, data[:-1])
-            data = [(d - 1.0)/254.0 for d in data]
-            # pack into proper location
-            thumb_data = ThumbData(data[0], data[1], data[2])  # data[3] is abduction
-            index_data = FingerData(data[4], data[5], data[3])
-            middle_data = FingerData(data[6], data[7], data[8])
-            ring_data = FingerData(data[9], data[10], data[11])
-            pinky_data = FingerData(data[12], data[13], data[14])
-            wrist_data = WristData(data[15], data[16], data[17])
-            return time, GloveData(thumb=thumb_data,
-                                   index=index_data, middle=middle_data,
-                                   ring=ring_data, pinky=pinky_data,
-                                   wrist=wrist_data)
+        # wait (up to the timeout) for at least one byte, then take everything available
+        self.reader.fill(self.dev.read(max(1, self.dev.in_waiting)))
+        frames = self.reader.take()
+        n = frames.shape[0]
+        if n:
+            time = self.clock()
+            data = (frames[:, 1:19] - 1.0) / 254.0
+            out = np.empty(n, dtype=GloveData)
+            out.view(np.float64).reshape((n, 18))[:] = data[:, glove_order]
+            return backdate(time, n, 1.0 / self.sampling_frequency), out
 
     def exit(self):
         self.dev.write(b'\x03')  # stop streaming
@@ -1,12 +1,11 @@
 from ctypes import c_double
 import platform
-import struct
 import numpy as np
 
 import hid
 import usb.core
 import usb.util
-from toon.input.device import BaseDevice
+from toon.input.hiddevice import HidDevice
 
 
 def get_teensy_path(serial_number):
@@ -24,36 +23,30 @@ def get_teensy_path(serial_number):
     return hid_path
 
 
-class Hand(BaseDevice):
+class Hand(HidDevice):
     sampling_frequency = 1000
     ctype = c_double
     shape = (15,)
+    # timestamp (us), deviation from period, and 20x16-bit analog channels
+    report_dtype = np.dtype([('time', '>u4'), ('deviation', '>i2'), ('analog', '>u2', (20,))])
+    device_clock = 'time'
+    clock_scale = 1e-6
 
     def __init__(self, serial_number=None, blocking=True, **kwargs):
-        super(Hand, self).__init__(**kwargs)
+        super(Hand, self).__init__(blocking=blocking, **kwargs)
         self._inv_sqrt2 = 1/np.sqrt(2)
-        self._device = None
-        self._buffer = np.full(15, np.nan)
         self.serial_number = serial_number
-        self.blocking = blocking
 
     def enter(self):
-        self._device = hid.device()
-        self._device.open_path(get_teensy_path(self.serial_number))
-        self._device.set_nonblocking(not self.blocking)
-
-    def exit(self):
-        self._device.close()
-
-    def read(self):
-        data = self._device.read(46)
-        time = self.clock()
-        # timestamp, deviation from period, and 20x16-bit analog channels
-        data = struct.unpack('>Lh' + 'H' * 20, bytearray(data))
-        data = np.array(data, dtype='d')
-        data[2:] /= 65535.0
-        data[2:] -= 0.5
-        self._buffer[0::3] = (data[2::4] - data[3::4]) * self._inv_sqrt2
-        self._buffer[1::3] = (data[2::4] + data[3::4]) * self._inv_sqrt2
-        self._buffer[2::3] = data[4::4] + data[5::4]
-        return time, self._buffer
+        self.handle = hid.device()
+        self.handle.open_path(get_teensy_path(self.serial_number))
+        # drain without blocking (the first read of each batch waits up to `timeout`)
+        self.handle.set_nonblocking(True)
+
+    def decode(self, reports):
+        analog = reports['analog'] / 65535.0 - 0.5
+        out = np.empty((reports.shape[0], 15))
+        out[:, 0::3] = (analog[:, 0::4] - analog[:, 1::4]) * self._inv_sqrt2
+        out[:, 1::3] = (analog[:, 0::4] + analog[:, 1::4]) * self._inv_sqrt2
+        out[:, 2::3] = analog[:, 2::4] + analog[:, 3::4]
+        return out
@@ -27,7 +27,14 @@ ext = [
               define_macros=defs),
     Extension('toon.anim.player',
               sources=['toon/anim/player.pyx'],
-              extra_compile_args=eca),
+              include_dirs=[np.get_include()],
+              extra_compile_args=eca,
+              define_macros=defs),
+    Extension('toon.input._commit',
+              sources=['toon/input/_commit.pyx'],
+              include_dirs=[np.get_include()],
+              extra_compile_args=eca,
+              define_macros=defs),
     Extension('toon.util.clock',
               sources=['toon/util/clock.pyx'],
               extra_compile_args=eca)
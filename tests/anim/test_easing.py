@@ -8,7 +8,9 @@ from toon.anim.easing import (LINEAR, STEP,
                               BACK_IN, BACK_OUT, BACK_IN_OUT,
                               BOUNCE_IN, BOUNCE_OUT, BOUNCE_IN_OUT)
 from toon.anim.easing import _test as _etest
-from pytest import approx
+from toon.anim.easing import ease
+from pytest import approx, raises
+import numpy as np
 
 interps = [LERP, SELECT]
 
@@ -33,3 +35,19 @@ def test_interps():
         assert(_itest(0, 1, 0, i) == 0)
         assert(_itest(0, 1, 1, i) == 1)
     assert(_itest(0, 1, 0.5, LERP) == 0.5)
+
+
+def test_ease_array():
+    x = np.linspace(0, 1, 101)
+    for i in easings:
+        assert(ease(x, i) == approx([_etest(v, i) for v in x]))
+    out = np.empty((3, 2))
+    res = ease([[0, 0.1], [0.2, 0.3], [0.4, 0.5]], SMOOTHSTEP, out=out)
+    assert(res is out)
+    assert(out[2, 1] == 0.5)
+    ease(out, QUADRATIC_IN, out=out)  # in place
+    assert(out[2, 1] == 0.25)
+    frozen = np.frombuffer(x.tobytes())  # read-only
+    assert(ease(frozen, SMOOTHSTEP) == approx(ease(x, SMOOTHSTEP)))
+    with raises(ValueError):
+        ease(x, 40)
@@ -112,3 +112,150 @@ def test_foo():
     player.advance(0.5) # rewind
     assert(circ.x == approx(0.5))
     assert(circ.y == 0)
+
+
+def test_array_track():
+    trk = Track([(0, (0, 0)), (1, (1, 2)), (2, (1, 2))])
+    circ = Circ()
+    player = Player()
+    player.add(trk, 'x', circ)
+    player.start(0)
+    player.advance(0.5)
+    assert(list(circ.x) == [0.5, 1])
+    player.advance(1.5)
+    assert(list(circ.x) == [1, 2])
+    prev = circ.x
+    player.advance(1.6)  # same value, so no update
+    assert(circ.x is prev)
+
+
+class Setter(object):
+    def __init__(self):
+        self.vals = []
+
+    def set(self, val, scale=1):
+        self.vals.append(val * scale)
+
+
+def test_targets():
+    trk = Track([(0, 0), (1, 1)])
+    setter = Setter()
+    circs = [Circ() for i in range(3)]
+
+    def cb(val, obj, index=None):
+        obj[index].y = -val
+
+    seen = []
+    player = Player()
+    player.add(trk, setter.set, None, scale=2)  # method
+    player.add(trk, cb, circs, index=1)  # callbacks get the list itself
+    player.add(trk, lambda val, obj: obj.append(val), seen)
+    player.add(trk, 'x', circs)  # attribute on each object in a list
+    player.start(0)
+    player.advance(0.25)
+    player.advance(0.25)  # no change, so no calls
+    assert(setter.vals == [0, 0.5])
+    assert(circs[1].y == -0.25)
+    assert(seen == [0, 0.25])
+    assert(all(c.x == 0.25 for c in circs))
+
+
+def test_list_targets():
+    import numpy as np
+    trk = Track([(0, 0), (1, 1)])
+    objs = [Circ()]
+    arr = np.array([Circ(), Circ()], dtype=object)
+    group = {Circ(), Circ()}
+    player = Player()
+    player.add(trk, 'x', objs)
+    player.add(trk, 'x', arr)
+    player.add(trk, 'x', group)
+    player.start(0)
+    objs.append(Circ())  # added after the track, still animated
+    player.advance(0.5)
+    assert([o.x for o in objs] == [0.5, 0.5])
+    assert(all(o.x == 0.5 for o in arr))
+    assert(all(o.x == 0.5 for o in group))
+
+
+def test_duck_typed_track():
+    import numpy as np
+
+    class Sine(object):
+        def at(self, time):
+            return np.array([np.sin(time), np.cos(time)])
+
+        def duration(self):
+            return 2
+
+    circ = Circ()
+    player = Player()
+    player.add(Sine(), 'x', circ)
+    player.start(0)
+    player.advance(0.5)
+    assert(np.allclose(circ.x, [np.sin(0.5), np.cos(0.5)]))
+    player.advance(3)
+    assert(np.allclose(circ.x, [np.sin(2), np.cos(2)]))
+
+
+def test_bind_array():
+    import numpy as np
+    verts = np.zeros((4, 2), dtype=np.float32)
+    player = Player()
+    player.bind_array(verts)
+    pos = Track([(0, (0, 0)), (1, (1, 2))])
+    player.add_slot(pos, 1)  # a whole row
+    player.add_slot(Track([(0, 0), (1, -1)]), (3, 0))  # a single element
+    player.start(0)
+    player.advance(0.5)
+    assert(list(verts[1]) == [0.5, 1])
+    assert(verts[3, 0] == -0.5)
+    assert(verts[0].sum() == 0)
+
+    # rebinding moves the slots to the new array
+    cols = np.zeros((4, 2))[:, ::-1]  # not contiguous
+    player.bind_array(cols)
+    player.advance(0.75)
+    assert(list(cols[1]) == [0.75, 1.5])
+    assert(cols[3, 0] == -0.75)
+
+    with pytest.raises(ValueError):
+        player.add_slot(pos, (1, 1))  # needs a row
+    with pytest.raises(ValueError):
+        player.add_slot(Track([(0, 'red'), (1, 'blue')]), 0)
+    with pytest.raises(ValueError):
+        Player().add_slot(pos, 0)  # nothing bound
+    with pytest.raises(ValueError):
+        player.bind_array(np.zeros((4, 2), dtype=np.int32))
+
+
+def test_bind_array_rejected():
+    import numpy as np
+    rows = np.zeros((10, 2))
+    player = Player()
+    player.bind_array(rows)
+    for i in range(10):
+        player.add_slot(Track([(0, (0, 0)), (1, (i, i))]), i)
+    player.start(0)
+    with pytest.raises(IndexError):
+        player.bind_array(np.zeros((5, 2)))  # too short for the last slots
+    # all slots still write to the original array
+    player.advance(0.5)
+    assert(np.all(rows == np.arange(10)[:, None] * 0.5))
+
+
+def test_add_slot_rejected():
+    import numpy as np
+    verts = np.zeros((4, 2))
+    player = Player()
+    player.bind_array(verts)
+    player.add_slot(Track([(0, (0, 0)), (1, (1, 1))]), 0)
+    with pytest.raises(TypeError):
+        player.add_slot(None, (0, 0))
+    with pytest.raises(IndexError):
+        player.add_slot(Track([(0, 0), (2, 1)]), (9, 0))
+    player.start(0)
+    player.advance(0.5)
+    assert(list(verts[0]) == [0.5, 0.5])
+    player.advance(1)
+    assert(player.is_stopped)  # the rejected track didn't extend the duration
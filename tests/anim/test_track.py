@@ -1,7 +1,10 @@
+import numpy as np
 import pytest
+from pytest import approx
 from toon.anim.track import Track
-from toon.anim.easing import SMOOTHERSTEP
-from toon.anim.interpolators import LERP, SELECT
+from toon.anim.easing import LINEAR, SMOOTHERSTEP
+from toon.anim.interpolators import (LERP, SELECT, CATMULL_ROM, MONOTONE_CUBIC,
+                                     CUBIC_SPLINE, spline_coefficients)
 
 
 def test_track():
@@ -48,4 +51,96 @@ def test_backwards():
     # rewind; the track has to loop around and start searching from the beginning of the keyframes
     assert(track.at(1.5) == 1.5)
     # forward
-    assert(track.at(4.5) == 4.5)
\ No newline at end of file
+    assert(track.at(4.5) == 4.5)
+
+def test_at_many():
+    kfs = [(t, np.sin(t)) for t in np.linspace(0, 10, 101)]
+    times = np.linspace(-1, 11, 1001)
+    for easing in [LINEAR, SMOOTHERSTEP]:
+        for interp in [LERP, SELECT]:
+            track = Track(kfs, interpolator=interp, easing=easing)
+            expected = [Track(kfs, interpolator=interp, easing=easing).at(t) for t in times]
+            assert(track.at_many(times) == approx(expected))
+            # unsorted times
+            rng = np.random.default_rng(1)
+            order = rng.permutation(times.shape[0])
+            assert(track.at_many(times[order]) == approx(np.array(expected)[order]))
+            assert(track.at_many(times[::-1]) == approx(expected[::-1]))
+    out = np.empty((2, 3))
+    res = Track(kfs).at_many([[0, 1, 2], [3, 4, 5]], out=out)
+    assert(res is out)
+    assert(out[1, 2] == approx(np.sin(5)))
+    # read-only input (e.g. np.frombuffer, memmapped trajectories)
+    frozen = times.copy()
+    frozen.flags.writeable = False
+    expected = Track(kfs).at_many(times)
+    assert(Track(kfs).at_many(frozen) == approx(expected))
+    assert(Track(kfs).at_many(np.frombuffer(times.tobytes())) == approx(expected))
+    # non-numeric values
+    track = Track([(0, 'red'), (1, 'green'), (2, 'blue')])
+    assert(list(track.at_many([0.5, 1.5, 3])) == ['red', 'green', 'blue'])
+
+
+def test_array_values():
+    kfs = [(0, (0, 0, 0)), (1, (1, 2, 3)), (2, np.array([0, 0, 1]))]
+    track = Track(kfs)
+    assert(list(track.at(0.5)) == [0.5, 1, 1.5])
+    out = np.empty(3)
+    assert(track.at(1.5, out=out) is out)
+    assert(list(out) == [0.5, 1, 2])
+    assert(list(track.at(5)) == [0, 0, 1])
+    res = track.at_many([0, 0.5, 1.5])
+    assert(res.shape == (3, 3))
+    assert(res[1] == approx([0.5, 1, 1.5]))
+    track = Track(kfs, easing=SMOOTHERSTEP)
+    assert(track.at(0.25)[2] == approx(3 * 0.103515625))
+    track = Track(kfs, interpolator=SELECT)
+    assert(list(track.at(0.99)) == [0, 0, 0])
+    with pytest.raises(ValueError):
+        track.at(0.5, out=np.empty(2))
+
+
+def test_seek():
+    # jumping around a long track should find the same keyframes as a fresh lookup
+    rng = np.random.default_rng(2)
+    times = np.cumsum(rng.uniform(0.001, 0.1, 1000))
+    times[500] = times[499]  # a jump
+    kfs = list(zip(times, rng.normal(size=1000)))
+    track = Track(kfs)
+    for t in rng.uniform(-1, times[-1] + 1, 500):
+        assert(track.at(t) == approx(Track(kfs).at(t)))
+        idx = np.clip(np.searchsorted(times, t, side='right') - 1, 0, 998)
+        if times[0] < t < times[-1]:
+            frac = (t - times[idx]) / (times[idx + 1] - times[idx])
+            assert(track.at(t) == approx(kfs[idx][1] + frac * (kfs[idx + 1][1] - kfs[idx][1])))
+
+
+def test_splines():
+    rng = np.random.default_rng(3)
+    times = np.cumsum(rng.uniform(0.1, 1, 10))
+    vals = rng.normal(size=(10, 2))
+    for inter in [CATMULL_ROM, MONOTONE_CUBIC, CUBIC_SPLINE]:
+        track = Track(list(zip(times, vals)), interpolator=inter)
+        # passes through the keyframes
+        assert(track.at_many(times) == approx(vals))
+        assert(Track(list(zip(times, vals[:, 0])), interpolator=inter).at(times[3]) == approx(vals[3, 0]))
+        # slopes match at the keyframes (per unit time)
+        c = spline_coefficients(times, vals, inter)
+        h = np.diff(times)[:, None]
+        end_slope = (c[:-1, :, 1] + 2 * c[:-1, :, 2] + 3 * c[:-1, :, 3]) / h[:-1]
+        assert(end_slope == approx(c[1:, :, 1] / h[1:]))
+    # natural spline: matching curvature, and none at the ends
+    c = spline_coefficients(times, vals, CUBIC_SPLINE)
+    end_curv = (2 * c[:-1, :, 2] + 6 * c[:-1, :, 3]) / h[:-1] ** 2
+    assert(end_curv == approx(2 * c[1:, :, 2] / h[1:] ** 2))
+    assert(c[0, :, 2] == approx(0, abs=1e-12))
+    assert(2 * c[-1, :, 2] + 6 * c[-1, :, 3] == approx(0, abs=1e-12))
+    # monotone data gives monotone curves (no overshoot)
+    steps = [(0, 0), (1, 0.1), (2, 1), (3, 1), (4, 5)]
+    res = Track(steps, interpolator=MONOTONE_CUBIC).at_many(np.linspace(0, 4, 401))
+    assert(np.all(np.diff(res) >= -1e-12))
+    # smooth paths need far fewer keyframes
+    t = np.linspace(0, 10, 21)
+    query = np.linspace(1, 9, 1000)
+    err = np.abs(Track(list(zip(t, np.sin(t))), interpolator=CUBIC_SPLINE).at_many(query) - np.sin(query))
+    assert(err.max() < 1e-3)
@@ -1,4 +1,4 @@
-from toon.input.device import BaseDevice
+from toon.input.device import BaseDevice, Stream
 from timeit import default_timer
 import ctypes
 import numpy as np
@@ -105,3 +105,62 @@ class Incrementing(BaseDevice):
         self.t0 = default_timer()
         t = self.clock()
         return t, data
+
+
+class Events(BaseDevice):
+    """Variable-length observations; the nth is n % 5 + 1 copies of n % 255."""
+    ctype = ctypes.c_uint8
+    variable_length = True
+    sampling_frequency = 1000
+    shape = (1,)
+    t0 = default_timer()
+    counter = 0
+
+    def read(self):
+        while default_timer() - self.t0 < (1.0/self.sampling_frequency):
+            pass
+        self.t0 = default_timer()
+        n = self.counter
+        self.counter += 1
+        return self.clock(), bytes([n % 255] * (n % 5 + 1))
+
+
+class MultiStream(BaseDevice):
+    """Dense positions, sparse clicks, and variable-length key presses."""
+    streams = {'clicks': Stream(ctypes.c_int, sampling_frequency=10),
+               'pos': Stream(ctypes.c_double, (2,)),
+               'keys': Stream(ctypes.c_uint8, variable_length=True)}
+    sampling_frequency = 1000
+    t0 = default_timer()
+    counter = 0
+
+    def read(self):
+        while default_timer() - self.t0 < (1.0/self.sampling_frequency):
+            pass
+        self.t0 = default_timer()
+        self.counter += 1
+        t = self.clock()
+        out = {'pos': (t, [self.counter, -self.counter])}
+        if self.counter % 100 == 0:
+            out['clicks'] = (t, self.counter)
+        if self.counter % 5 == 0:
+            out['keys'] = (t, b'abc'[:self.counter % 3 + 1])
+        return out
+
+
+class Blocks(BaseDevice):
+    """Commits observations in blocks of 10, with values counting up."""
+    ctype = Point
+    sampling_frequency = 1000
+    t0 = default_timer()
+    counter = 0
+
+    def read(self):
+        while default_timer() - self.t0 < (10.0/self.sampling_frequency):
+            pass
+        self.t0 = default_timer()
+        t = self.clock()
+        data = np.zeros(10, dtype=Point)
+        data['x'] = np.arange(self.counter, self.counter + 10)
+        self.counter += 10
+        return t - np.arange(9, -1, -1) * 1e-3, data
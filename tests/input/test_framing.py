@@ -0,0 +1,60 @@
+import numpy as np
+from toon.input import FrameReader
+from toon.input.framing import backdate
+
+
+class FakePort(object):
+    def __init__(self, data):
+        self.data = bytes(data)
+
+    @property
+    def in_waiting(self):
+        return len(self.data)
+
+    def read(self, n):
+        out, self.data = self.data[:n], self.data[n:]
+        return out
+
+
+def frames(n, start=0):
+    # 4-byte frames: 0x80 | counter, then three bytes with the top bit clear
+    return bytes(b for i in range(start, start + n) for b in (0x80 | (i % 128), i % 128, 1, 2))
+
+
+def test_whole_frames():
+    rdr = FrameReader(4, sync=0x80, sync_mask=0x80)
+    port = FakePort(frames(10) + frames(1)[:2])
+    out = rdr.read(port)
+    assert(out.shape == (10, 4))
+    assert(np.array_equal(out[:, 1], np.arange(10)))
+    assert(port.in_waiting == 0)
+    # rest of the partial frame arrives
+    out = rdr.read(frames(1)[2:])
+    assert(out.shape == (1, 4))
+    assert(rdr.read(b'').shape == (0, 4))
+
+
+def test_resync():
+    rdr = FrameReader(4, sync=0x80, sync_mask=0x80, exclusive=True)
+    # start mid-frame, and lose two bytes in the middle
+    data = frames(5)[2:] + frames(3, 5)[:-6] + frames(4, 8)
+    out = rdr.read(data)
+    assert(rdr.dropped > 0)
+    assert(np.all(out[:, 0] & 0x80))
+    assert(np.array_equal(out[:, 1], [1, 2, 3, 4, 5, 8, 9, 10, 11]))
+
+
+def test_dtype_and_max():
+    dt = np.dtype([('head', 'u1'), ('count', 'u1'), ('val', '>u2')])
+    rdr = FrameReader(4, sync=0x80, sync_mask=0x80, dtype=dt)
+    rdr.fill(frames(6))
+    assert(rdr.available() == 6)
+    out = rdr.take(4)
+    assert(out.dtype == dt and out.shape == (4,))
+    assert(np.array_equal(out['val'], [0x0102] * 4))
+    assert(rdr.take()['count'].tolist() == [4, 5])
+
+
+def test_backdate():
+    t = backdate(1.0, 3, 0.01)
+    assert(np.allclose(t, [0.98, 0.99, 1.0]))
@@ -0,0 +1,93 @@
+import ctypes
+from time import sleep
+import numpy as np
+from toon.input import HidDevice, MpDevice
+
+report = np.dtype([('time', '>u4'), ('value', '>i2'), ('analog', '>u2', (4,))])
+
+
+class FakeHandle(object):
+    """Queues `n` reports per batch, with a device clock ticking at 1 kHz (in us)."""
+
+    def __init__(self, n=5, start=0):
+        self.n = n
+        self.tick = start
+        self.count = 0
+        self.queue = []
+
+    def read(self, size, timeout_ms=0):
+        if not self.queue:
+            if not timeout_ms:
+                return []
+            sleep(0.001)
+            for i in range(self.n):
+                rep = np.zeros(1, dtype=report)
+                rep['time'] = self.tick % 2**32
+                rep['value'] = -self.count
+                rep['analog'] = self.count
+                self.queue.append(list(rep.tobytes()))
+                self.tick += 1000
+                self.count += 1
+        return self.queue.pop(0)
+
+
+class Fake(HidDevice):
+    sampling_frequency = 1000
+    ctype = ctypes.c_double
+    shape = (2,)
+    report_dtype = report
+    device_clock = 'time'
+
+    def __init__(self, start=0, **kwargs):
+        super(Fake, self).__init__(**kwargs)
+        self.start = start
+
+    def enter(self):
+        self.handle = FakeHandle(start=self.start)
+
+    def decode(self, reports):
+        out = np.empty((reports.shape[0], 2))
+        out[:, 0] = reports['value']
+        out[:, 1] = reports['analog'].sum(axis=1)
+        return out
+
+
+def test_drain():
+    dev = Fake()
+    with dev:
+        times, data = dev.read()
+        assert(data.shape == (5, 2))
+        assert(np.array_equal(data[:, 0], -np.arange(5)))
+        assert(np.array_equal(data[:, 1], 4 * np.arange(5)))
+        assert(np.allclose(np.diff(times), 1e-3))
+        times, data = dev.read()
+        assert(data[0, 0] == -5)
+
+
+def test_wrapped_clock():
+    dev = Fake(start=2**32 - 2500)
+    with dev:
+        times, data = dev.read()
+    assert(np.allclose(np.diff(times), 1e-3))
+
+
+class Small(Fake):
+    max_reports = 3
+
+
+def test_max_reports():
+    dev = Small()
+    with dev:
+        times, data = dev.read()
+        assert(data.shape[0] == 3)
+        times, data = dev.read()
+        assert(data.shape[0] == 2)
+
+
+def test_mp():
+    dev = MpDevice(Fake())
+    with dev:
+        sleep(0.2)
+        times, data = dev.read()
+    assert(data.shape[1] == 2)
+    assert(all(np.diff(data[:, 0]) == -1))
@@ -1,11 +1,17 @@
+import ctypes
+import multiprocessing as mp
+import warnings
 from time import sleep
-from pytest import raises, approx
+from pytest import raises, approx, warns
 import numpy as np
 from tests.input.mockdevices import (Dummy, Timebomb, DummyList,
                                      SometimesNot, StructObs, Incrementing,
-                                     NoData, NpStruct)
-from toon.util import mono_clock
-from toon.input import MpDevice
+                                     NoData, NpStruct, Events, MultiStream, Point,
+                                     Blocks)
+from toon.util import mono_clock, affinity, priority
+from toon.util import memory
+from toon.input import MpDevice, read_all
+from toon.input.mpdevice import Counters, make_stream, attach_rings, commit
 
 Dummy.sampling_frequency = 1000
 
@@ -32,6 +38,38 @@ def test_err():
             dat = dev.read()
 
 
+def test_status():
+    dev = MpDevice(Timebomb())
+    assert(dev.status == 'stopped')
+    with dev:
+        assert(dev.status in ('running', 'errored'))
+        sleep(0.2)
+        assert(dev.status == 'errored')
+        with raises(ValueError):
+            dev.read()
+    dev = MpDevice(Dummy())
+    with dev:
+        assert(dev.status == 'running')
+    assert(dev.status == 'stopped')
+
+
+def test_supervised_restart():
+    dev = MpDevice(Timebomb(), max_restarts=2, restart_backoff=0.001)
+    seqs = []
+    with dev:
+        with warns(UserWarning):
+            with raises(ValueError):
+                for i in range(200):
+                    if dev.read() is not None:
+                        seqs.append(dev.sequence)
+                    sleep(0.01)
+    assert(dev.restarts == 2)
+    seqs = np.hstack(seqs)
+    # each restart leaves a gap
+    assert(np.sum(np.diff(seqs) > 1) == 2)
+    assert(all(np.diff(seqs) > 0))
+
+
 def test_list():
     dev = MpDevice(DummyList())
     with dev:
@@ -208,4 +246,261 @@ def test_start_start():
     dev.start()
     with raises(RuntimeError):
         dev.start()
-    dev.stop()
\ No newline at end of file
+    dev.stop()
+
+def test_trace():
+    dev = MpDevice(Dummy(), trace=True)
+    with dev:
+        sleep(0.1)
+        dev.read()
+    trace = dev.export_trace()
+    events = trace['traceEvents']
+    names = set([e['name'] for e in events])
+    assert('process_data' in names and 'read' in names)
+    assert(len(set([e['pid'] for e in events])) == 2)
+    ts = [e['ts'] for e in events]
+    assert(ts == sorted(ts))
+    with raises(RuntimeError):
+        MpDevice(Dummy()).export_trace()
+
+
+def test_stats():
+    dev = MpDevice(Dummy())
+    with dev:
+        for i in range(200):
+            dev.read()
+        st = dev.stats
+    assert(all([v >= 0 for v in st]))
+    assert(st.read_blocked_time >= 0 and st.read_blocked_time < 1)
+    dev.reset_stats()
+    assert(sum(dev.stats) == 0)
+    # resetting while running leaves the shared counters to the child
+    with dev:
+        sleep(0.1)
+        dev.reset_stats()
+        sleep(0.1)
+        dev.read()
+        st = dev.stats
+        assert(0 < st.samples < dev._counters.samples)
+
+
+def test_auto_buffer_len():
+    dev = MpDevice(Incrementing(), buffer_len='auto', warmup=0.3)
+    # starts at the default (1 s of a 100 Hz device), with room for 8 s
+    assert(dev.buffer_status.capacity == 100)
+    assert(dev.buffer_status.max_capacity == 800)
+    vals = []
+    with dev:
+        dev.read()
+        for i in range(40):
+            sleep(0.016)
+            res = dev.read()
+            if res is not None:
+                vals.append(res.data)
+        st = dev.buffer_status
+        # a stall that fits the buffer, but uses most of it: grow before anything is lost
+        sleep(0.7)
+        vals.append(dev.read().data)
+        dev.read()
+        grown = dev.buffer_status
+        # a stall longer than the buffer: grow again
+        sleep(1.5 * grown.capacity / 100.0)
+        dev.read()
+        dev.read()
+        regrown = dev.buffer_status
+    assert(st.peak > 0)
+    assert(st.capacity >= 100)  # never below the default
+    assert(grown.capacity > 100)
+    assert(regrown.capacity > grown.capacity)
+    vals = np.hstack(vals)
+    assert(all(np.diff(vals) == 1))  # nothing dropped so far
+
+
+def test_health():
+    dev = MpDevice(Incrementing())
+    with dev:
+        sleep(1.5)
+        h = dev.health
+        assert(not h.stalled)
+        assert(h.age < 0.1)
+        # 100 Hz device, but leave room for a busy machine
+        assert(h.rate > 50 and h.rate < 150)
+    dev = MpDevice(NoData(), stall_multiple=5)
+    with dev:
+        sleep(0.1)
+        assert(dev.health.stalled)
+        assert(dev.read() is None)
+
+
+def test_compiled_commit():
+    # compiled and python commit paths should agree, including once the ring is full
+    for shape, ctype, vals in [((1,), ctypes.c_double, [i / 3 for i in range(25)]),
+                               ((1,), ctypes.c_int16, list(range(25))),
+                               ((3,), ctypes.c_float, [np.full(3, i) for i in range(25)]),
+                               ((3,), ctypes.c_int32, [[i, i, i] for i in range(25)]),
+                               ((1,), Point, [Point(i, -i) for i in range(25)])]:
+        out = []
+        for compiled in [False, True]:
+            counters = mp.RawValue(Counters)
+            strm = make_stream(10, shape, ctype, ctypes.c_double)
+            if compiled:
+                attach_rings(strm, counters)
+            for i, v in enumerate(vals[:20]):
+                commit(strm, (float(i), v), counters)
+            commit(strm, [(float(i + 20), v) for i, v in enumerate(vals[20:])], counters)
+            pack = strm['data'][0]
+            out.append((pack['np_time'].copy(), pack['np_data'].copy(), pack['np_seq'].copy(),
+                        pack['counter'].value, counters.samples, counters.dropped))
+        py, cy = out
+        for a, b in zip(py, cy):
+            assert(np.array_equal(a, b))
+        assert(cy[3] == 10 and cy[5] == 15)
+
+    # out of range values are left to numpy on both paths
+    # (wrapped around with a warning before numpy 2, an OverflowError after)
+    out = []
+    for compiled in [False, True]:
+        counters = mp.RawValue(Counters)
+        strm = make_stream(10, (1,), ctypes.c_int32, ctypes.c_double)
+        if compiled:
+            attach_rings(strm, counters)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', DeprecationWarning)
+            try:
+                commit(strm, (0.0, 2**40), counters)
+                out.append(strm['data'][0]['np_data'][0])
+            except OverflowError:
+                out.append(OverflowError)
+    assert(out[0] == out[1])
+
+    # a bad observation leaves the buffer and counters as they were, even once full
+    counters = mp.RawValue(Counters)
+    strm = make_stream(10, (3,), ctypes.c_double, ctypes.c_double)
+    attach_rings(strm, counters)
+    pack = strm['data'][0]
+    for n in [5, 12]:
+        while counters.samples < n:
+            commit(strm, (float(counters.samples), np.full(3, counters.samples)), counters)
+        before = (pack['np_time'].copy(), pack['np_data'].copy(), pack['np_seq'].copy(),
+                  pack['counter'].value, counters.samples, counters.dropped, strm['seq'].value)
+        with raises(ValueError):
+            commit(strm, (float(n), [1, 2]), counters)
+        after = (pack['np_time'], pack['np_data'], pack['np_seq'],
+                 pack['counter'].value, counters.samples, counters.dropped, strm['seq'].value)
+        for a, b in zip(before, after):
+            assert(np.array_equal(a, b))
+
+
+def test_read_all():
+    devs = [MpDevice(Dummy()), MpDevice(NoData()), MpDevice(MultiStream())]
+    with devs[0], devs[1], devs[2]:
+        sleep(0.2)
+        res = read_all(devs)
+        assert(len(res) == 3)
+        assert(res[0] is not None and res[1] is None and res[2] is not None)
+        assert(res[0].time.shape[0] > 10)
+        # nothing arrives on NoData, so wait out the timeout
+        t0 = mono_clock.get_time()
+        assert(read_all(devs[1:2], timeout=0.1) == [None])
+        assert(mono_clock.get_time() - t0 >= 0.1)
+        # wait for the next observation from Dummy
+        read_all(devs)
+        res = read_all(devs[:2], timeout=None)
+        assert(res[0] is not None)
+
+
+def test_blocks():
+    dev = MpDevice(Blocks(), buffer_len=25)
+    with dev:
+        sleep(0.2)
+        time, data = dev.read()
+        assert(time.shape[0] == data.shape[0] == 25)  # oldest ones dropped
+        assert(all(np.diff(data['x']) == 1))
+        assert(all(np.diff(dev.sequence) == 1))
+        assert(all(np.diff(time) > 0))
+        res = None
+        while res is None:
+            sleep(0.015)
+            res = dev.read()
+        time, data = res
+        assert(all(np.diff(data['x']) == 1))
+        assert(np.array_equal(dev.sequence, data['x']))
+
+
+def test_affinity():
+    cpus = affinity()
+    if cpus is None:
+        return
+    dev = MpDevice(Dummy(), cpus=cpus[-1:])
+    with warns(UserWarning):
+        dev.start()
+    assert(dev.affinity == cpus[-1:])
+    dev.stop()
+
+
+def test_lock_memory():
+    dev = MpDevice(Dummy(), lock_memory=True, huge_pages=True)
+    with dev:
+        sleep(0.1)
+        status = dev.memory_status
+        remote_vmlck = memory.locked_bytes(dev.process.pid)
+        assert(dev.read() is not None)
+        # dropping back from priority level 2 (munlockall on Linux) shouldn't undo the lock
+        priority(2)
+        priority(0)
+        after = dev.memory_status
+    # locking may be refused (RLIMIT_MEMLOCK), but should be reported either way
+    assert(isinstance(status.locked, bool) and isinstance(status.remote_locked, bool))
+    vmlck = memory.locked_bytes()
+    if vmlck is not None:  # Linux, so we can check what's really locked
+        if status.locked:
+            assert(vmlck > 0 and after.locked)
+        if status.remote_locked:
+            assert(remote_vmlck > 0)
+    if status.page_faults is not None:
+        assert(status.remote_page_faults is not None)
+
+
+def check_events(time, data):
+    values, offsets = data
+    assert(offsets[0] == 0 and offsets[-1] == values.shape[0])
+    assert(offsets.shape[0] == time.shape[0] + 1)
+    for i in range(time.shape[0]):
+        ev = values[offsets[i]:offsets[i + 1]]
+        assert(all(ev == ev[0]))
+        assert(ev.shape[0] == ev[0] % 5 + 1)
+
+
+def test_variable_length():
+    dev = MpDevice(Events())
+    with dev:
+        sleep(0.2)
+        time, data = dev.read()
+    assert(time.shape[0] > 10)
+    check_events(time, data)
+
+
+def test_variable_length_overflow():
+    # the arena fills up before the index does, so the oldest observations get dropped
+    dev = MpDevice(Events(), buffer_len=100, arena_len=30)
+    with dev:
+        sleep(0.2)
+        time, data = dev.read()
+    check_events(time, data)
+    assert(data.offsets[-1] <= 30)
+    assert(all(np.diff(time) > 0))
+    assert(dev.stats.dropped > 0)
+
+
+def test_streams():
+    dev = MpDevice(MultiStream())
+    assert(dev._streams[0]['data'][0]['np_data'].shape == (10,))
+    with dev:
+        sleep(0.3)
+        clicks, pos, keys = dev.read()
+        assert(dev.read().clicks is None)
+    assert(pos.data.shape[1] == 2)
+    assert(all(pos.data[:, 0] == -pos.data[:, 1]))
+    assert(clicks.data.shape[0] < pos.data.shape[0] // 50)
+    assert(all(clicks.data % 100 == 0))
+    assert(keys.time.shape[0] + 1 == keys.data.offsets.shape[0])
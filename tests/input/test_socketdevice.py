@@ -0,0 +1,94 @@
+import ctypes
+import socket
+from time import sleep
+import numpy as np
+from toon.input import MpDevice, SocketDevice
+
+packet = np.dtype([('frame', '>u4'), ('pos', '>f4', (3,))])
+
+
+class Tracker(SocketDevice):
+    ctype = ctypes.c_double
+    shape = (4,)
+    packet_dtype = packet
+
+    def decode(self, packets):
+        out = np.empty((packets.shape[0], 4))
+        out[:, 0] = packets['frame']
+        out[:, 1:] = packets['pos']
+        return out
+
+
+class PrefixedTracker(Tracker):
+    length_prefix = '>u2'
+
+
+def packets(start, n):
+    out = np.zeros(n, dtype=packet)
+    out['frame'] = np.arange(start, start + n)
+    out['pos'] = out['frame'][:, None] * [1, 2, 3]
+    return out
+
+
+def free_port(kind):
+    with socket.socket(socket.AF_INET, kind) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def check(data, first, n):
+    assert(np.array_equal(data[:, 0], np.arange(first, first + n)))
+    assert(np.array_equal(data[:, 3], 3 * data[:, 0]))
+
+
+def test_udp():
+    addr = ('127.0.0.1', free_port(socket.SOCK_DGRAM))
+    dev = Tracker(address=addr)
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    with dev:
+        assert(dev.read() is None)  # times out
+        for p in packets(0, 20):
+            sender.sendto(p.tobytes(), addr)
+        sender.sendto(b'short', addr)
+        times, data = dev.read()
+        check(data, 0, 20)
+        assert(dev.dropped == 1)
+        assert(all(np.diff(times) >= 0))
+    sender.close()
+
+
+def test_tcp_prefixed():
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.bind(('127.0.0.1', 0))
+    server.listen(1)
+    dev = PrefixedTracker(address=server.getsockname(), protocol='tcp')
+    with dev:
+        conn, _ = server.accept()
+        frames = np.zeros(10, dtype=[('length', '>u2'), ('packet', packet)])
+        frames['length'] = packet.itemsize
+        frames['packet'] = packets(0, 10)
+        raw = frames.tobytes()
+        # split mid-packet
+        conn.sendall(raw[:45])
+        sleep(0.05)
+        times, data = dev.read()
+        check(data, 0, 45 // frames.itemsize)
+        conn.sendall(raw[45:])
+        sleep(0.05)
+        times, data = dev.read()
+        check(data, 45 // frames.itemsize, 10 - 45 // frames.itemsize)
+        conn.close()
+    server.close()
+
+
+def test_mp():
+    addr = ('127.0.0.1', free_port(socket.SOCK_DGRAM))
+    dev = MpDevice(Tracker(address=addr))
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    with dev:
+        for p in packets(0, 100):
+            sender.sendto(p.tobytes(), addr)
+        sleep(0.2)
+        times, data = dev.read()
+    sender.close()
+    check(data, 0, 100)
@@ -0,0 +1,10 @@
+from toon.util.jitter import measure_jitter, survey
+
+
+def test_jitter():
+    res = measure_jitter(period=1e-3, duration=0.05, allocate=10)
+    assert(res.lateness.shape == (50,))
+    assert(res.percentiles[100] >= res.percentiles[50])
+    assert(res.histogram[0].sum() == 50)
+    results = survey(levels=(0, 1), period=1e-3, duration=0.01)
+    assert(len(results) == 4)
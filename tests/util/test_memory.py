@@ -0,0 +1,23 @@
+import ctypes
+import multiprocessing as mp
+from toon.util import memory, priority
+
+
+def test_memory():
+    arr = mp.RawArray(ctypes.c_double, 10000)
+    arr[5] = 3
+    memory.prefault(arr)
+    assert(arr[5] == 3)
+    locked = memory.lock(arr)
+    assert(isinstance(locked, bool))
+    vmlck = memory.locked_bytes()
+    if locked and vmlck is not None:
+        assert(vmlck >= ctypes.sizeof(arr))
+        # priority() unlocks everything when dropping from level 2, then re-locks
+        priority(2)
+        priority(0)
+        assert(memory.locked_bytes() >= ctypes.sizeof(arr))
+    memory.unlock(arr)
+    assert(isinstance(memory.advise_huge_pages(arr), bool))
+    faults = memory.page_faults()
+    assert(faults is None or (faults[0] >= 0 and faults[1] >= 0))
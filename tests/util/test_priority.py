@@ -1,6 +1,14 @@
-from toon.util import priority
+from toon.util import priority, affinity
 
 
 def test_priority():
     for i in range(3):
         assert(priority(i) is not None)
+
+
+def test_affinity():
+    original = affinity()
+    if original is None:  # not supported (e.g. MacOS)
+        return
+    assert(affinity([original[0]]) == [original[0]])
+    assert(affinity(original) == original)
@@ -1,3 +1,3 @@
-ctypedef double (*EaseFn)(double x)
+ctypedef double (*EaseFn)(double x) noexcept nogil
 
 cdef EaseFn eases[19]
@@ -6,6 +6,8 @@
 #cython: cdivision=True
 from libc.math cimport sin, pi, pow
 
+import numpy as np
+
 cpdef enum easings:
     LINEAR
     STEP
@@ -29,51 +31,51 @@ cpdef enum easings:
 
 cdef inline double pihalf = pi / 2
 
-cdef inline double linear(const double x):
+cdef inline double linear(const double x) noexcept nogil:
     return x
 
 
-cdef inline double step(const double x):
+cdef inline double step(const double x) noexcept nogil:
     return 0.0 if x < 0.5 else 1.0
 
 
-cdef inline double smoothstep(const double x):
+cdef inline double smoothstep(const double x) noexcept nogil:
     if x <= 0.0:
         return 0.0
     if x >= 1.0:
         return 1.0
     return (3.0 - 2.0 * x) * pow(x, 2)
 
-cdef inline double smootherstep(const double x):
+cdef inline double smootherstep(const double x) noexcept nogil:
     if x <= 0.0:
         return 0.0
     if x >= 1.0:
         return 1.0
     return pow(x, 3) * (x * (x * 6.0 - 15.0) + 10.0)
 
-cdef inline double quadratic_in(const double x):
+cdef inline double quadratic_in(const double x) noexcept nogil:
     return pow(x, 2)
 
 
-cdef inline double quadratic_out(const double x):
+cdef inline double quadratic_out(const double x) noexcept nogil:
     return -x * (x - 2.0)
 
 
-cdef inline double quadratic_in_out(const double x):
+cdef inline double quadratic_in_out(const double x) noexcept nogil:
     if x < 0.5:
         return 2.0*pow(x, 2)
     return 1.0 - 2.0*pow(1.0 - x, 2)
 
 
-cdef inline double exponential_in(const double x):
+cdef inline double exponential_in(const double x) noexcept nogil:
     return 0.0 if x <= 0.0 else pow(2.0, 10.0 * (x - 1.0))
 
 
-cdef inline double exponential_out(const double x):
+cdef inline double exponential_out(const double x) noexcept nogil:
     return 1.0 if x >= 1.0 else 1.0 - pow(2.0, -10.0 * x)
 
 
-cdef inline double exponential_in_out(const double x):
+cdef inline double exponential_in_out(const double x) noexcept nogil:
     if x <= 0.0:
         return 0.0
     if x >= 1.0:
@@ -83,37 +85,37 @@ cdef inline double exponential_in_out(const double x):
     return 1.0 - 0.5 * pow(2.0, 10.0 - 20.0 * x)
 
 
-cdef inline double elastic_in(const double x):
+cdef inline double elastic_in(const double x) noexcept nogil:
     return pow(2.0, 10.0 * (x - 1.0)) * sin(13.0 * pihalf * x)
 
 
-cdef inline double elastic_out(const double x):
+cdef inline double elastic_out(const double x) noexcept nogil:
     return 1.0 - pow(2.0, -10.0 * x) * sin(13.0 * pihalf * (x + 1.0))
 
 
-cdef inline double elastic_in_out(const double x):
+cdef inline double elastic_in_out(const double x) noexcept nogil:
     if x < 0.5:
         return 0.5 * pow(2.0, 10.0 * (2.0 * x - 1.0)) * sin(13.0 * pi * x)
     return 1.0 - 0.5 * pow(2.0, 10.0 * (1.0 - 2.0 * x)) * sin(13.0 * pi * x)
 
 
-cdef inline double back_in(const double x):
+cdef inline double back_in(const double x) noexcept nogil:
     return x * (x * x - sin(pi * x))
 
 
-cdef inline double back_out(const double x):
+cdef inline double back_out(const double x) noexcept nogil:
     inv = 1.0 - x
     return 1 - inv*(inv*inv - sin(pi*inv))
 
 
-cdef inline double back_in_out(const double x):
+cdef inline double back_in_out(const double x) noexcept nogil:
     if x < 0.5:
         x2 = 2.0 * x
         return 0.5 * x2 * (x2 * x2 - sin(pi * x2))
     inv = 2.0 - 2.0 * x
     return 1.0 - 0.5 * inv * (inv * inv - sin(pi * inv))
 
-cdef inline double bounce_out(const double x):
+cdef inline double bounce_out(const double x) noexcept nogil:
     if x == 0:
         return 0
     if x < 4.0/11.0:
@@ -127,11 +129,11 @@ cdef inline double bounce_out(const double x):
     return 54.0/5.0 * x*x - 513.0/25.0*x + 268.0/25.0
 
 
-cdef inline double bounce_in(const double x):
+cdef inline double bounce_in(const double x) noexcept nogil:
     return 1.0 - bounce_out(1.0 - x)
 
 
-cdef inline double bounce_in_out(const double x):
+cdef inline double bounce_in_out(const double x) noexcept nogil:
     if x < 0.5:
         return 0.5 * bounce_in(2*x)
     return 0.5 * bounce_out(2.0 * x - 1) + 0.5
@@ -139,6 +141,39 @@ cdef inline double bounce_in_out(const double x):
 cpdef double _test(double x, easings ease):
     return eases[<int>ease](x)
 
+
+def ease(x, easings easing, out=None):
+    """Apply an easing function to every element of an array.
+
+    Parameters
+    ----------
+    x: array-like of float
+        Input values (normally in [0, 1]).
+    easing: easings
+        One of the easings in this module (e.g. `SMOOTHSTEP`).
+    out: ndarray of float64, optional
+        Where to put the result (same shape as `x`, and may be `x` itself).
+
+    Returns
+    -------
+    ndarray of float64.
+    """
+    if not LINEAR <= easing <= BOUNCE_IN_OUT:
+        raise ValueError('Unknown easing %i.' % easing)
+    x = np.ascontiguousarray(x, dtype=np.float64)
+    if out is None:
+        out = np.empty(x.shape, dtype=np.float64)
+    elif out.shape != x.shape or out.dtype != np.float64 or not out.flags.c_contiguous:
+        raise ValueError('out must be a contiguous float64 array of shape %s.' % (x.shape,))
+    cdef const double[::1] src = x.reshape(-1)
+    cdef double[::1] dst = out.reshape(-1)
+    cdef EaseFn fn = eases[<int>easing]
+    cdef Py_ssize_t i
+    with nogil:
+        for i in range(src.shape[0]):
+            dst[i] = fn(src[i])
+    return out
+
 eases[:] = [linear, step, smoothstep, smootherstep, quadratic_in,
             quadratic_out, quadratic_in_out, exponential_in, exponential_out,
             exponential_in_out, elastic_in, elastic_out, elastic_in_out,
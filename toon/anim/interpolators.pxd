@@ -1,8 +1,12 @@
 from cpython.ref cimport PyObject
 
-cdef inline double lerp(const double v0, const double v1, const double t):
+cdef inline double lerp(const double v0, const double v1, const double t) noexcept nogil:
     return (1.0 - t) * v0 + t * v1
 
 # need to be careful? https://github.com/cython/cython/issues/2589
 cdef inline PyObject * select(PyObject * v0, PyObject * v1, const double t):
-    return v0 if t < 1.0 else v1
\ No newline at end of file
+    return v0 if t < 1.0 else v1
+
+# one segment of a spline, with coefficients from `spline_coefficients`
+cdef inline double cubic(const double* c, const double u) noexcept nogil:
+    return ((c[3] * u + c[2]) * u + c[1]) * u + c[0]
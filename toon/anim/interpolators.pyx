@@ -4,12 +4,101 @@
 #cython: infertypes=True
 #cython: initializedcheck=False
 #cython: cdivision=True
+cimport cython
+import numpy as np
 
 cpdef enum interpolations:
     LERP
     SELECT
+    CATMULL_ROM
+    MONOTONE_CUBIC
+    CUBIC_SPLINE
 
 cpdef _test(a, b, const double t, interpolations inter):
     if inter == LERP:
         return lerp(a, b, t)
     return <object>select(<PyObject *>a, <PyObject *>b, t)
+
+
+@cython.wraparound(True)
+def _div(a, b):
+    # a / b, with 0 wherever b is 0 (duplicate keyframe times)
+    return np.divide(a, b, out=np.zeros(np.broadcast(a, b).shape), where=b != 0)
+
+
+@cython.wraparound(True)
+def spline_coefficients(times, values, interpolations inter):
+    """Cubic coefficients of each segment between keyframes.
+
+    Parameters
+    ----------
+    times: (n,) array of float
+        Keyframe times (sorted).
+    values: (n, k) array of float
+        Keyframe values, with k components each.
+    inter: interpolations
+        CATMULL_ROM, MONOTONE_CUBIC (no overshoot between keyframes), or CUBIC_SPLINE
+        (natural cubic spline, continuous second derivative).
+
+    Returns
+    -------
+    (n - 1, k, 4) array, where segment i evaluates to `c[0] + c[1]*u + c[2]*u**2 + c[3]*u**3`
+    for u going from 0 to 1 between keyframes i and i + 1.
+    """
+    times = np.asarray(times, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)
+    n = times.shape[0]
+    if n < 2:
+        return np.zeros((0, values.shape[1], 4))
+    h = np.diff(times)[:, None]
+    delta = _div(np.diff(values, axis=0), h)  # secant slopes
+    # slope at each keyframe
+    if inter == CATMULL_ROM:
+        slopes = np.empty_like(values)
+        slopes[1:-1] = _div(values[2:] - values[:-2], (times[2:] - times[:-2])[:, None])
+        slopes[0] = delta[0]
+        slopes[-1] = delta[-1]
+    elif inter == MONOTONE_CUBIC:
+        # Fritsch-Butland: weighted harmonic mean of the secants, flat at extrema
+        slopes = np.empty_like(values)
+        slopes[0] = delta[0]
+        slopes[-1] = delta[-1]
+        w1 = 2 * h[1:] + h[:-1]
+        w2 = h[1:] + 2 * h[:-1]
+        d0 = delta[:-1]
+        d1 = delta[1:]
+        same = d0 * d1 > 0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = (w1 + w2) / (w1 / d0 + w2 / d1)
+        slopes[1:-1] = np.where(same, mean, 0.0)
+    elif inter == CUBIC_SPLINE:
+        # second derivatives (zero at the ends), from a tridiagonal system
+        curv = np.zeros_like(values)
+        if n > 2:
+            diag = 2 * (h[:-1] + h[1:])
+            rhs = 6 * (delta[1:] - delta[:-1])
+            m = n - 2
+            cp = np.zeros((m, 1))
+            dp = np.zeros((m, values.shape[1]))
+            for i in range(m):  # Thomas algorithm
+                denom = diag[i] - (h[i] * cp[i - 1] if i else 0)
+                cp[i] = _div(h[i + 1], denom) if i < m - 1 else 0
+                dp[i] = _div(rhs[i] - (h[i] * dp[i - 1] if i else 0), denom)
+            for i in range(m - 1, -1, -1):
+                curv[i + 1] = dp[i] - (cp[i] * curv[i + 2] if i < m - 1 else 0)
+        slopes = np.empty_like(values)
+        slopes[:-1] = delta - h * (2 * curv[:-1] + curv[1:]) / 6
+        slopes[-1] = delta[-1] + h[-1] * (curv[-2] + 2 * curv[-1]) / 6
+    else:
+        raise ValueError('Not a spline interpolator: %i.' % inter)
+    # cubic Hermite segments, in terms of u = (t - t_i) / h_i
+    p0 = values[:-1]
+    p1 = values[1:]
+    m0 = h * slopes[:-1]
+    m1 = h * slopes[1:]
+    coefs = np.empty((n - 1, values.shape[1], 4))
+    coefs[..., 0] = p0
+    coefs[..., 1] = m0
+    coefs[..., 2] = 3 * (p1 - p0) - 2 * m0 - m1
+    coefs[..., 3] = 2 * (p0 - p1) + m0 + m1
+    return coefs
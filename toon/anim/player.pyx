@@ -6,10 +6,45 @@
 #cython: cdivision=True
 from copy import copy
 from inspect import ismethod
+from operator import index as as_index
+
+import numpy as np
+cimport numpy as np
+from cpython.mem cimport PyMem_Malloc, PyMem_Realloc, PyMem_Free
+from libc.string cimport memcmp
+from .track cimport Track, TrackData, evaluate
 ctypedef enum states: STOPPED, PLAYING
+# how each track's value gets to its target(s), resolved once in `Player.add`
+ctypedef enum kinds: ATTRIBUTE, METHOD, CALLBACK
+
+
+cdef class _Entry:
+    """One track added to a Player, along with its target."""
+    cdef object track
+    cdef Track fast  # same as `track` if it's a toon Track (None for other track-like objects)
+    cdef int width  # components of an array-valued Track
+    cdef kinds kind
+    cdef object attr
+    cdef object obj
+    cdef bint fan_out  # set the attribute on each object in `obj` (e.g. a list of objects)
+    cdef dict kwargs  # None if empty
+    cdef object prev_val
+
+
+# a track writing into the bound array (see `Player.bind_array`)
+ctypedef struct Slot:
+    TrackData* track
+    char* dst  # first component
+    Py_ssize_t stride  # bytes between components
+    int ncomp
+
+
+cdef inline bint same_array(np.ndarray a, np.ndarray b):
+    return memcmp(np.PyArray_DATA(a), np.PyArray_DATA(b), np.PyArray_NBYTES(a)) == 0
+
 
 cdef class Player:
-    
+
     cdef public int repeats
     cdef int _repeats
     cdef states state
@@ -17,39 +52,145 @@ cdef class Player:
     cdef double duration
     cdef public double timescale
     cdef list tracks
-    cdef list prev_vals
+    cdef object array
+    cdef bint single  # bound array is float32
+    cdef list slot_tracks  # (track, index) for each slot, keeping the tracks alive
+    cdef Slot* slots
+    cdef Py_ssize_t n_slots
+    cdef np.float64_t[::1] scratch
 
     def __init__(self, int repeats=1):
         self.tracks = []
+        self.array = None
+        self.slot_tracks = []
+        self.slots = NULL
+        self.n_slots = 0
+        self.scratch = np.zeros(1)
         self.state = STOPPED
         self.ref_time = 0
         self.duration = 0
         self.timescale = 1
-        self.prev_vals = []
         self.repeats = repeats
         self._repeats = repeats # track
-    
+
+    def __dealloc__(self):
+        PyMem_Free(self.slots)
+
+    def bind_array(self, arr):
+        """Write the values of tracks added with `add_slot` directly into an array.
+
+        Parameters
+        ----------
+        arr: ndarray of float32 or float64
+            E.g. vertex positions or colors, ready to upload to the GPU. Tracks added
+            with `add_slot` are evaluated without the GIL and written in place on each
+            `advance()`, with no per-object Python work.
+
+        Notes
+        -----
+        Binding a new array moves existing slots to the same indices of the new array.
+        If any of them don't fit, nothing changes (the old array stays bound).
+        """
+        if not isinstance(arr, np.ndarray) or arr.dtype not in (np.float32, np.float64):
+            raise ValueError('Can only bind float32 or float64 arrays.')
+        if not arr.flags.writeable:
+            raise ValueError('Bound array must be writeable.')
+        cdef Slot* slots = <Slot*> PyMem_Malloc(max(self.n_slots, 1) * sizeof(Slot))
+        if slots == NULL:
+            raise MemoryError()
+        try:
+            for i, (track, index) in enumerate(self.slot_tracks):
+                slots[i] = _make_slot(arr, track, index)
+        except:
+            PyMem_Free(slots)
+            raise
+        PyMem_Free(self.slots)
+        self.slots = slots
+        self.array = arr
+        self.single = arr.dtype == np.float32
+
     def add(self, track, attr, obj, **kwargs):
-        self.tracks.append({'track': track, 'attr': attr, 
-                            'obj': obj, 'kwargs': kwargs})
-        self.prev_vals.append(None)
+        """Animate something with a Track.
+
+        Parameters
+        ----------
+        track: Track
+            Or any object with `at(time)` and `duration()` methods.
+        attr: str or callable
+            Name of the attribute to set, a method to call with each new value
+            (`attr(val, **kwargs)`), or a function to call with each new value and
+            the object (`attr(val, obj, **kwargs)`).
+        obj: object, or list of objects
+            Target of the attribute or function. When setting an attribute, a list (or any
+            other iterable without that attribute) of objects sets it on each of them, as they
+            are when the value changes. Functions get `obj` as-is.
+        """
+        cdef _Entry entry = _Entry()
+        entry.track = track
+        if isinstance(track, Track):
+            entry.fast = track
+            entry.width = entry.fast.width
+        entry.attr = attr
+        entry.obj = obj
+        entry.kwargs = kwargs or None
+        if callable(attr):
+            entry.kind = METHOD if ismethod(attr) else CALLBACK
+        else:
+            entry.kind = ATTRIBUTE
+        # containers (lists, sets, object arrays...) don't take new attributes themselves
+        entry.fan_out = (entry.kind == ATTRIBUTE and hasattr(obj, '__iter__') and
+                         not hasattr(obj, attr) and not hasattr(obj, '__dict__'))
+        self.tracks.append(entry)
+        self._extend(track)
+
+    def add_slot(self, Track track not None, index):
+        """Animate an element of the bound array (see `bind_array`) with a Track.
+
+        Parameters
+        ----------
+        track: Track
+            A numeric Track.
+        index: int or tuple of int
+            Element of the bound array to write the track's values to. For array-valued
+            tracks, this picks out a row (along the last axis) with one element per component.
+        """
+        if self.array is None:
+            raise ValueError('Call bind_array() before adding slots.')
+        if track.numvals is None:
+            raise ValueError('Only numeric tracks can write to an array.')
+        # everything that can fail comes before any changes to the slots
+        cdef Slot slot = _make_slot(self.array, track, index)
         new_dur = track.duration()
+        if track.width > self.scratch.shape[0]:
+            self.scratch = np.zeros(track.width)
+        cdef Slot* slots = <Slot*> PyMem_Realloc(self.slots, (self.n_slots + 1) * sizeof(Slot))
+        if slots == NULL:
+            raise MemoryError()
+        self.slots = slots
+        self.slots[self.n_slots] = slot
+        self.slot_tracks.append((track, index))
+        self.n_slots += 1
         if new_dur > self.duration:
             self.duration = new_dur
-        
+
+    def _extend(self, track):
+        new_dur = track.duration()
+        if new_dur > self.duration:
+            self.duration = new_dur
+
     cpdef start(self, const double time):
         self.ref_time = time
         self._repeats = self.repeats
         self.state = PLAYING
         self.advance(time)
-    
+
     cpdef stop(self):
         self.state = STOPPED
-    
+
     cpdef reset(self):
         self.advance(self.ref_time)
         self.state = STOPPED
-    
+
     cpdef resume(self, const double time):
         if self.state == PLAYING:
             return
@@ -67,6 +208,7 @@ cdef class Player:
         if time < self.ref_time:
             return
         cdef double time2 = time
+        cdef _Entry entry
         # if we've gone beyond, stop playing after one more iteration
         if time - self.ref_time >= self.duration:
             self._repeats -= 1
@@ -75,41 +217,46 @@ cdef class Player:
                 time2 = self.ref_time + self.duration
             else:
                 self.ref_time = self.ref_time + self.duration
-        for counter, trk in enumerate(self.tracks):
+        cdef double track_time = (time2 - self.ref_time) * self.timescale
+        if self.n_slots:
+            with nogil:
+                self._write_slots(track_time)
+        for entry in self.tracks:
             # if tracks are playing, will return a val
-            val = trk['track'].at((time2 - self.ref_time) * self.timescale)
-            prev_val = self.prev_vals[counter]
-            self.prev_vals[counter] = val
-            if val == prev_val:
+            if entry.fast is not None:
+                val = entry.fast.at(track_time)
+            else:
+                val = entry.track.at(track_time)
+            prev_val = entry.prev_val
+            entry.prev_val = val
+            if entry.width:  # array-valued Track (a new array each time)
+                if prev_val is not None and same_array(val, prev_val):
+                    continue
+            elif type(val) is np.ndarray:
+                if prev_val is not None and np.array_equal(val, prev_val):
+                    continue
+            elif val == prev_val:
                 continue
-            # unpack
-            attr = trk['attr']
-            obj = trk['obj']
-            kwargs = trk['kwargs']
-            try:  # see if single object
-                self._do_update(attr, val, obj, **kwargs)
-            except (TypeError, AttributeError):  # list of objects?
-                for o in obj:
-                    self._do_update(attr, val, o, **kwargs)
-
-
-    def _do_update(self, attr, val, obj, **kwargs):
-        # if we get a function, call function with updated val
-        if callable(attr):
-            # if it's a method (e.g. a setter), we call that method with the val as an arg
-            if ismethod(attr):
-                if kwargs:
-                    attr(val, **kwargs)
-                else:
-                    attr(val)
-                return
-            if kwargs:
-                attr(val, obj, **kwargs)
+            if entry.fan_out:
+                for o in entry.obj:
+                    _update(entry, val, o)
             else:
-                attr(val, obj)
-            return
-        # otherwise (user gave string), directly set the attribute
-        setattr(obj, attr, val)
+                _update(entry, val, entry.obj)
+
+    cdef void _write_slots(self, const double time) noexcept nogil:
+        cdef Py_ssize_t i
+        cdef int j
+        cdef Slot* slot
+        cdef double* buf = &self.scratch[0]
+        for i in range(self.n_slots):
+            slot = &self.slots[i]
+            evaluate(slot.track, time, buf)
+            if self.single:
+                for j in range(slot.ncomp):
+                    (<float*> (slot.dst + j * slot.stride))[0] = <float> buf[j]
+            else:
+                for j in range(slot.ncomp):
+                    (<double*> (slot.dst + j * slot.stride))[0] = buf[j]
 
     @property
     def is_playing(self):
@@ -118,3 +265,35 @@ cdef class Player:
     @property
     def is_stopped(self):
         return self.state == STOPPED
+
+
+cdef Slot _make_slot(np.ndarray arr, Track track, index) except *:
+    """Where `track` writes to in `arr` (raises if `index` doesn't fit it)."""
+    cdef np.ndarray view
+    cdef Slot slot
+    if track is None:  # typed arguments still accept None (and nonecheck is off)
+        raise TypeError('Expected a Track, got None.')
+    idx = tuple(as_index(j) for j in index) if isinstance(index, tuple) else (as_index(index),)
+    view = arr[idx + (Ellipsis,)]
+    if view.ndim != (1 if track.width else 0) or (track.width and view.shape[0] != track.width):
+        raise ValueError('Index %s of the bound array has shape %s, but the track has %i component(s).' %
+                         (index, (<object> view).shape, max(track.width, 1)))
+    slot.track = &track.data
+    slot.dst = <char*> np.PyArray_DATA(view)
+    slot.stride = view.strides[0] if view.ndim else 0
+    slot.ncomp = max(track.width, 1)
+    return slot
+
+
+cdef inline _update(_Entry entry, val, obj):
+    if entry.kind == ATTRIBUTE:
+        setattr(obj, entry.attr, val)
+    elif entry.kind == METHOD:
+        if entry.kwargs is None:
+            entry.attr(val)
+        else:
+            entry.attr(val, **entry.kwargs)
+    elif entry.kwargs is None:
+        entry.attr(val, obj)
+    else:
+        entry.attr(val, obj, **entry.kwargs)
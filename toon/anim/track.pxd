@@ -0,0 +1,32 @@
+cimport numpy as np
+from .easing cimport EaseFn
+
+
+# what evaluating a numeric track needs, without touching Python objects
+ctypedef struct TrackData:
+    const double* times
+    const double* vals  # (len_times, ncomp), C order
+    const double* coefs  # (len_times - 1, ncomp, 4) for splines, C order
+    int len_times
+    int ncomp  # components per value (1 for scalars)
+    int interpolator
+    EaseFn easing
+    int prev_index
+
+
+cdef class Track:
+
+    cdef int interpolator
+    cdef np.float64_t[::1] times
+    cdef list vals
+    cdef np.float64_t[:, ::1] numvals  # vals as rows of doubles, if numeric
+    cdef np.float64_t[:, :, ::1] coefs  # per-segment cubic coefficients, for splines
+    cdef readonly int width  # length of each value (0 if scalar)
+    cdef TrackData data
+
+    cpdef at(self, const double time, out=*)
+    cpdef duration(self)
+
+
+cdef int locate(TrackData* d, const double time, double* time_warp) noexcept nogil
+cdef void evaluate(TrackData* d, const double time, double* out) noexcept nogil
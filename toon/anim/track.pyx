@@ -8,79 +8,198 @@ from cpython.ref cimport PyObject
 
 import numpy as np
 cimport numpy as np
-from .interpolators import LERP, SELECT
-from .interpolators cimport lerp, select
+from .interpolators import LERP, SELECT, spline_coefficients
+from .interpolators cimport lerp, select, cubic
 from .easing import LINEAR
 from .easing cimport EaseFn, eases
 
 
 cdef class Track:
-    
-    cdef EaseFn easing
-    cdef int interpolator
-    cdef np.float64_t[::1] times
-    cdef list vals
-    cdef int prev_index
-    cdef int len_times
 
     def __init__(self, data, interpolator=LERP, easing=LINEAR):
         self.interpolator = interpolator
-        self.easing = eases[<int>easing]
+        self.data.easing = eases[<int>easing]
 
         self.times = np.array([d[0] for d in data], dtype=np.float64)
-        self.len_times = self.times.shape[0]
         self.vals = [d[1] for d in data] # we don't really know the datatype here
-        self.prev_index = 0
+        self.numvals = None
+        self.width = 0
 
-        if not isinstance(self.vals[0], (float, int)):
+        if all(isinstance(v, (float, int)) for v in self.vals):
+            self.numvals = np.array(self.vals, dtype=np.float64).reshape((-1, 1))
+        elif not isinstance(self.vals[0], str):
+            # sequences of numbers (e.g. positions, colors) are interpolated component-wise
+            try:
+                arrvals = np.array(self.vals, dtype=np.float64)
+            except (ValueError, TypeError):
+                arrvals = None
+            if arrvals is not None and arrvals.ndim == 2 and arrvals.shape[1]:
+                self.numvals = arrvals
+                self.width = arrvals.shape[1]
+        if self.numvals is None:
             self.interpolator = SELECT
-            self.easing = eases[<int>LINEAR]
-
-    cpdef at(self, const double time):
-        if time <= self.times[0]:
-            self.prev_index = 0
-            return self.vals[0]
-        if time >= self.times[self.len_times - 1]:
-            self.prev_index = self.len_times - 1
-            return self.vals[self.len_times - 1]
-        if time == self.times[self.prev_index]:
-            return self.vals[self.prev_index]
-        cdef double time_scaled, time_warp
-        cdef int reference, target
-        time_scaled, reference, target = get_warptime(self.prev_index, time, 
-                                                    self.len_times, &self.times[0])
-        self.prev_index = reference
-        time_warp = self.easing(time_scaled)
+            self.data.easing = eases[<int>LINEAR]
+
+        self.coefs = None
+        self.data.coefs = NULL
+        if self.interpolator > SELECT:
+            self.coefs = spline_coefficients(self.times, self.numvals, self.interpolator)
+            if self.coefs.shape[0]:
+                self.data.coefs = &self.coefs[0, 0, 0]
+
+        self.data.times = &self.times[0]
+        self.data.len_times = self.times.shape[0]
+        self.data.vals = NULL if self.numvals is None else &self.numvals[0, 0]
+        self.data.ncomp = max(self.width, 1)
+        self.data.interpolator = self.interpolator
+        self.data.prev_index = 0
+
+    cpdef at(self, const double time, out=None):
+        """Value of the track at `time`.
+
+        For array-valued tracks, the value is written to `out` (a float64 array with one
+        element per component) if provided, otherwise to a new array.
+        """
+        cdef double time_warp
+        cdef np.ndarray arr
+        if self.width:
+            if out is None:
+                arr = np.empty(self.width, dtype=np.float64)
+            else:
+                arr = out
+                if (arr.ndim != 1 or arr.shape[0] != self.width or
+                        np.PyArray_TYPE(arr) != np.NPY_DOUBLE or not np.PyArray_IS_C_CONTIGUOUS(arr)):
+                    raise ValueError('out must be a contiguous float64 array of shape (%i,).' % self.width)
+            evaluate(&self.data, time, <double*> np.PyArray_DATA(arr))
+            return arr
+        cdef double val
+        if self.interpolator > 1: # splines
+            evaluate(&self.data, time, &val)
+            return val
+        cdef int reference = locate(&self.data, time, &time_warp)
+        if time_warp == 0.0:
+            return self.vals[reference]
         if self.interpolator == 0: # LERP
-            return lerp(self.vals[reference], self.vals[target], time_warp)
-        return <object>select(<PyObject *>self.vals[reference], <PyObject *>self.vals[target], time_warp)
+            return lerp(self.vals[reference], self.vals[reference + 1], time_warp)
+        return <object>select(<PyObject *>self.vals[reference], <PyObject *>self.vals[reference + 1], time_warp)
+
+    def at_many(self, times, out=None):
+        """Evaluate the track at many times in one call.
+
+        Parameters
+        ----------
+        times: array-like of float
+            Times to evaluate. Any order works, but sorted times are cheapest
+            (keyframes are found by a single walk through the track).
+        out: ndarray of float64, optional
+            Where to put the values (same shape as `times`, plus a trailing
+            dimension for the components of array-valued tracks).
+
+        Returns
+        -------
+        ndarray of float64 (or of objects, if the values aren't numeric).
+        """
+        times = np.ascontiguousarray(times, dtype=np.float64)
+        if self.numvals is None:
+            out = np.empty(times.shape, dtype=object)
+            flat = out.reshape(-1)
+            for k, t in enumerate(times.reshape(-1)):
+                flat[k] = self.at(t)
+            return out
+        shape = times.shape + (self.width,) if self.width else times.shape
+        if out is None:
+            out = np.empty(shape, dtype=np.float64)
+        elif out.shape != shape or out.dtype != np.float64 or not out.flags.c_contiguous:
+            raise ValueError('out must be a contiguous float64 array of shape %s.' % (shape,))
+        cdef const np.float64_t[::1] t_view = times.reshape(-1)
+        cdef np.float64_t[::1] out_view = out.reshape(-1)
+        cdef Py_ssize_t i
+        cdef int ncomp = self.data.ncomp
+        with nogil:
+            for i in range(t_view.shape[0]):
+                evaluate(&self.data, t_view[i], &out_view[i * ncomp])
+        return out
 
     cpdef duration(self):
-        return self.times[self.len_times - 1]
-
-cdef (double, int, int) get_warptime(const int prev_index, const double time, 
-                            const int len_times, const double* times) nogil:
-    cdef int index
-    cdef int reference
-    cdef int target
-    cdef double sign = time - times[prev_index]
-    cdef double goal_time, new_time
-
-    if sign > 0:
-        for index in range(prev_index + 1, len_times):
-            if time < times[index]:
-                break
-        
-        reference = index - 1
-        target = index
+        return self.times[self.data.len_times - 1]
+
+
+cdef int locate(TrackData* d, const double time, double* time_warp) noexcept nogil:
+    """Find the last keyframe at or before `time` (clamped to the ends of the track),
+    and the eased fraction of the way to the next one (0 if on or past a keyframe)."""
+    cdef const double* times = d.times
+    cdef int last = d.len_times - 1
+    cdef int index = d.prev_index
+    time_warp[0] = 0.0
+    if time <= times[0]:
+        index = 0
+    elif time >= times[last]:
+        index = last
+    else:
+        index = gallop(times, index, last, time)
+        if time > times[index]:
+            time_warp[0] = d.easing((time - times[index]) / (times[index + 1] - times[index]))
+    d.prev_index = index
+    return index
+
+
+cdef void evaluate(TrackData* d, const double time, double* out) noexcept nogil:
+    """Write the value of a numeric track at `time` to `out` (`d.ncomp` doubles)."""
+    cdef int j
+    cdef double time_warp
+    cdef int index = locate(d, time, &time_warp)
+    cdef int ncomp = d.ncomp
+    cdef const double* v0 = d.vals + index * ncomp
+    cdef const double* v1 = v0 + ncomp
+    cdef const double* c
+    if time_warp == 0.0 or (d.interpolator == 1 and time_warp < 1.0):
+        for j in range(ncomp):
+            out[j] = v0[j]
+    elif d.interpolator == 0: # LERP
+        for j in range(ncomp):
+            out[j] = lerp(v0[j], v1[j], time_warp)
+    elif d.interpolator == 1: # SELECT
+        for j in range(ncomp):
+            out[j] = v1[j]
+    else: # splines
+        c = d.coefs + index * ncomp * 4
+        for j in range(ncomp):
+            out[j] = cubic(c + 4 * j, time_warp)
+
+
+cdef inline int gallop(const double* times, const int start, const int last,
+                       const double time) noexcept nogil:
+    """Index of the last keyframe at or before `time` (which must be inside the track),
+    searching outward from `start` in doubling steps and then bisecting.
+
+    Costs O(1) when `time` is in the same or next segment (playback, sorted times),
+    and O(log distance) when seeking.
+    """
+    cdef int lo, hi
+    cdef int step = 1
+    if time >= times[start]:
+        lo = start
+        hi = start + 1
+        while hi < last and times[hi] <= time:
+            lo = hi
+            step *= 2
+            hi = start + step
+        if hi > last:
+            hi = last
     else:
-        for index in range(prev_index - 1, -1, -1):
-            if time > times[index]:
-                break
-        
-        reference = index
-        target = index + 1
-    
-    goal_time = times[target] - times[reference]
-    new_time = time - times[reference]
-    return 1.0 - ((goal_time - new_time)/goal_time), reference, target
+        hi = start
+        lo = start - 1
+        while lo > 0 and times[lo] > time:
+            hi = lo
+            step *= 2
+            lo = start - step
+        if lo < 0:
+            lo = 0
+    # times[lo] <= time < times[hi]
+    while hi - lo > 1:
+        mid = (lo + hi) // 2
+        if times[mid] <= time:
+            lo = mid
+        else:
+            hi = mid
+    return lo
@@ -1,2 +1,5 @@
-from toon.input.mpdevice import MpDevice
-from toon.input.device import BaseDevice
+from toon.input.mpdevice import MpDevice, read_all
+from toon.input.device import BaseDevice, Stream
+from toon.input.framing import FrameReader
+from toon.input.hiddevice import HidDevice
+from toon.input.socketdevice import SocketDevice
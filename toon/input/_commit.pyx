@@ -0,0 +1,219 @@
+# cython: boundscheck=False, wraparound=False
+"""Compiled commit path for fixed-size observations (see `mpdevice.commit`).
+
+Writes go straight into the shared buffers with memcpy/memmove, so the child process
+only pays Python overhead for handing over each (time, data) pair.
+"""
+import ctypes
+
+import numpy as np
+cimport numpy as cnp
+from cpython.buffer cimport PyObject_GetBuffer, PyBuffer_Release, PyBUF_SIMPLE
+from libc.stdint cimport (int8_t, int16_t, int32_t, int64_t,
+                          uint8_t, uint16_t, uint32_t, uint64_t)
+from libc.string cimport memcpy, memmove
+
+cnp.import_array()
+
+# same layout as mpdevice.Counters
+cdef struct Counters:
+    uint64_t samples
+    uint64_t dropped
+    uint64_t flips
+    uint64_t remote_blocked
+    uint64_t read_blocked
+    uint64_t read_blocked_ns
+
+
+cdef inline bint set_scalar(char* dst, object val, char kind, Py_ssize_t size) except -1:
+    """Convert a Python scalar directly into the shared buffer. Returns False
+    for combinations we don't handle here."""
+    if kind == b'f':
+        if size == 8:
+            (<double*> dst)[0] = val
+        elif size == 4:
+            (<float*> dst)[0] = val
+        else:
+            return False
+    elif kind == b'i':
+        if size == 8:
+            (<int64_t*> dst)[0] = val
+        elif size == 4:
+            (<int32_t*> dst)[0] = val
+        elif size == 2:
+            (<int16_t*> dst)[0] = val
+        elif size == 1:
+            (<int8_t*> dst)[0] = val
+        else:
+            return False
+    elif kind == b'u':
+        if size == 8:
+            (<uint64_t*> dst)[0] = val
+        elif size == 4:
+            (<uint32_t*> dst)[0] = val
+        elif size == 2:
+            (<uint16_t*> dst)[0] = val
+        elif size == 1:
+            (<uint8_t*> dst)[0] = val
+        else:
+            return False
+    elif kind == b'b' and size == 1:
+        (<uint8_t*> dst)[0] = bool(val)
+    else:
+        return False
+    return True
+
+
+cdef class Ring:
+    """One of the two buffers of a stream, as raw pointers into shared memory.
+
+    Parameters
+    ----------
+    pack: dict
+        One element of `stream['data']` (see `mpdevice.make_stream`), already attached.
+    seq: multiprocessing.RawValue
+        The stream's next sequence number.
+    counters: mpdevice.Counters
+        Shared counters.
+    """
+    cdef char* data
+    cdef char* time
+    cdef uint64_t* seq_arr
+    cdef unsigned int* counter
+    cdef unsigned int* capacity
+    cdef uint64_t* seq
+    cdef Counters* counters
+    cdef Py_ssize_t row_bytes
+    cdef Py_ssize_t time_bytes
+    cdef Py_ssize_t data_size
+    cdef char time_kind
+    cdef char data_kind
+    cdef bint scalar
+    cdef bint is_struct
+    cdef object dtype
+    cdef object pack  # keep the shared arrays alive
+    # one observation, converted here before anything shared changes
+    cdef object row_scratch
+    cdef object time_scratch
+    cdef char* row_buf
+    cdef char* time_buf
+
+    def __init__(self, dict pack, seq, counters):
+        np_data = pack['np_data']
+        np_time = pack['np_time']
+        self.pack = pack
+        self.dtype = np_data.dtype
+        self.data = <char*> <size_t> ctypes.addressof(pack['mp_data'])
+        self.time = <char*> <size_t> ctypes.addressof(pack['mp_time'])
+        self.seq_arr = <uint64_t*> <size_t> ctypes.addressof(pack['mp_seq'])
+        self.counter = <unsigned int*> <size_t> ctypes.addressof(pack['counter'])
+        self.capacity = <unsigned int*> <size_t> ctypes.addressof(pack['capacity'])
+        self.seq = <uint64_t*> <size_t> ctypes.addressof(seq)
+        self.counters = <Counters*> <size_t> ctypes.addressof(counters)
+        self.row_bytes = np_data[0].nbytes if np_data.ndim > 1 else np_data.itemsize
+        self.time_bytes = np_time.itemsize
+        self.time_kind = ord(np_time.dtype.kind)
+        self.data_kind = ord(self.dtype.kind)
+        self.data_size = self.dtype.itemsize
+        self.scalar = np_data.ndim == 1
+        self.is_struct = self.dtype.type == np.void
+        # one row long, so assigning to row 0 works like assigning to a row of the buffer
+        self.row_scratch = np.zeros((1,) + np_data.shape[1:], dtype=self.dtype)
+        self.time_scratch = np.zeros(1, dtype=np_time.dtype)
+        self.row_buf = <char*> cnp.PyArray_DATA(self.row_scratch)
+        self.time_buf = <char*> cnp.PyArray_DATA(self.time_scratch)
+
+    cdef int _convert_time(self, object t) except -1:
+        """Convert a timestamp into `time_buf`."""
+        try:
+            if set_scalar(self.time_buf, t, self.time_kind, self.time_bytes):
+                return 0
+        except OverflowError:
+            pass  # let numpy decide, like `mpdevice.process_data`
+        self.time_scratch[0] = t
+        return 0
+
+    cdef int _convert_data(self, object val) except -1:
+        """Convert an observation into `row_buf`."""
+        cdef char* dst = self.row_buf
+        cdef Py_buffer view
+        if self.scalar and (type(val) is float or type(val) is int or type(val) is bool):
+            try:
+                if set_scalar(dst, val, self.data_kind, self.data_size):
+                    return 0
+            except OverflowError:
+                pass
+        if ((type(val) is np.ndarray and val.dtype == self.dtype and
+                (<cnp.ndarray> val).flags.c_contiguous) or
+                (self.is_struct and isinstance(val, ctypes.Structure))):
+            PyObject_GetBuffer(val, &view, PyBUF_SIMPLE)
+            try:
+                if view.len == self.row_bytes:
+                    memcpy(dst, view.buf, self.row_bytes)
+                    return 0
+            finally:
+                PyBuffer_Release(&view)
+        # anything else goes through numpy, like `mpdevice.process_data`
+        if self.is_struct:
+            val = np.frombuffer(val, dtype=self.dtype)
+        self.row_scratch[0] = val
+        return 0
+
+    cpdef write(self, object t, object val):
+        """Commit one (time, data) observation (the buffer's lock must be held).
+
+        Values are converted as in `mpdevice.process_data`. If that fails, the exception
+        propagates and the buffer and counters are left as they were.
+        """
+        cdef Py_ssize_t i = self.counter[0]
+        cdef Py_ssize_t cap = self.capacity[0]
+        cdef Py_ssize_t row = self.row_bytes
+        cdef Py_ssize_t trow = self.time_bytes
+        cdef bint full = i >= cap
+        self._convert_time(t)
+        self._convert_data(val)
+        self.counters.samples += 1
+        if full:
+            # ring buffer ish, shift everything down one row
+            i = cap - 1
+            memmove(self.data, self.data + row, i * row)
+            memmove(self.time, self.time + trow, i * trow)
+            memmove(self.seq_arr, self.seq_arr + 1, i * sizeof(uint64_t))
+            self.counters.dropped += 1
+        memcpy(self.time + i * trow, self.time_buf, trow)
+        memcpy(self.data + i * row, self.row_buf, row)
+        self.seq_arr[i] = self.seq[0]
+        self.seq[0] += 1
+        if not full:
+            self.counter[0] = i + 1
+
+    def write_many(self, list observations):
+        """Commit a list of (time, data) observations."""
+        cdef object obs
+        for obs in observations:
+            self.write(obs[0], obs[1])
+
+
+cdef class Pending:
+    """Number of observations waiting in the current buffer of a stream, read straight
+    from shared memory (so `MpDevice.read()` can skip an empty stream cheaply).
+
+    Parameters
+    ----------
+    stream: dict
+        See `mpdevice.make_stream`.
+    """
+    cdef unsigned char* index
+    cdef unsigned int* counters[2]
+    cdef object refs  # keep the shared values alive
+
+    def __init__(self, dict stream):
+        index = stream['buffer_index']
+        counters = [pack['counter'] for pack in stream['data']]
+        self.refs = (index, counters)
+        self.index = <unsigned char*> <size_t> ctypes.addressof(index)
+        for i in range(2):
+            self.counters[i] = <unsigned int*> <size_t> ctypes.addressof(counters[i])
+
+    def __call__(self):
+        return self.counters[self.index[0] != 0][0]
@@ -1,6 +1,23 @@
 import abc
+from collections import namedtuple
 from toon.util import mono_clock
 
+Stream = namedtuple('Stream', ['ctype', 'shape', 'sampling_frequency', 'variable_length'])
+Stream.__new__.__defaults__ = ((1,), None, False)
+Stream.__doc__ = """Description of one stream of observations from a device.
+
+Parameters
+----------
+ctype:
+    Python type, numpy dtype, or ctype (including ctypes.Structures) of the data.
+shape: tuple, optional
+    Shape of each observation. Defaults to (1,).
+sampling_frequency: int, optional
+    Used for preallocation (like BaseDevice.sampling_frequency). Defaults to the device's.
+variable_length: bool, optional
+    See BaseDevice.variable_length.
+"""
+
 
 def prevent_if_remote(func):
     """Decorator to raise RuntimeError in order to prevent accidental use
@@ -21,6 +38,16 @@ class BaseDevice(metaclass=abc.ABCMeta):
     sampling_frequency: int
         Expected sampling frequency of the device, used by toon.input.MpDevice for preallocation.
         We preallocate for 1 second of data (e.g. 500 samples for a sampling_frequency of 500 Hz).
+    variable_length: bool
+        If True, each observation is a sequence of any length (e.g. bytes, a list, or a 1D array)
+        of elements with the given `shape` and `ctype`. toon.input.MpDevice packs these into a
+        shared arena instead of padding every observation to a worst case.
+    streams: dict, optional
+        Maps stream names to `Stream`s, for devices producing several kinds of data
+        (e.g. clicks and positions from a mouse). Each stream gets its own shared buffers,
+        sized independently. `read()` should return a dict mapping stream names to (time, data)
+        tuples (or lists of them); streams without new data can be left out. If provided,
+        `shape`, `ctype`, and `variable_length` are ignored.
 
     Notes
     -----
@@ -29,6 +56,8 @@ class BaseDevice(metaclass=abc.ABCMeta):
     sampling_frequency = 500
     shape = (1,)  # shape can technically be None...
     ctype = None  # ctype must be present
+    variable_length = False
+    streams = None
 
     def __init__(self, clock=mono_clock.get_time):
         """Create new device.
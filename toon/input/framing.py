@@ -0,0 +1,134 @@
+import numpy as np
+
+
+class FrameReader(object):
+    """Split a byte stream (e.g. from a serial port) into fixed-size frames.
+
+    Bytes are accumulated across calls, and all complete frames are handed back
+    at once as a 2D uint8 array (or a 1D array of a structured dtype), so decoding
+    can be vectorized over the whole batch.
+    """
+
+    def __init__(self, frame_size, sync=None, sync_mask=0xff, exclusive=False, dtype=None):
+        """Create a new FrameReader.
+
+        Parameters
+        ----------
+        frame_size: int
+            Number of bytes per frame.
+        sync: int, optional
+            Value of the first byte of each frame (after masking with `sync_mask`).
+            If provided, bytes that don't line up with a frame start are discarded
+            (e.g. after a glitch, or when starting mid-frame).
+        sync_mask: int, optional
+            Bits of the first byte to compare against `sync`.
+        exclusive: bool, optional
+            If True, the sync pattern never appears elsewhere in a frame (e.g. protocols
+            that set the high bit of the first byte only), so frames containing it past
+            the first byte are discarded as well.
+        dtype: numpy dtype, optional
+            If provided, frames are returned as a 1D array of this dtype (its itemsize
+            must match the frame size), rather than as an (n, frame_size) uint8 array.
+        """
+        self.frame_size = int(frame_size)
+        self.sync = sync
+        self.sync_mask = sync_mask
+        self.exclusive = exclusive
+        self.dtype = None
+        if dtype is not None:
+            self.dtype = np.dtype(dtype)
+            if self.dtype.itemsize != self.frame_size:
+                raise ValueError('dtype is %i bytes, but frames are %i bytes.' %
+                                 (self.dtype.itemsize, self.frame_size))
+        self.dropped = 0  # bytes discarded while resynchronizing
+        self._buf = np.zeros(0, dtype=np.uint8)
+        self._checked = 0  # bytes at the head of the buffer known to be whole frames
+
+    def fill(self, source):
+        """Add bytes to the buffer.
+
+        Parameters
+        ----------
+        source: bytes-like, or object with `in_waiting` and `read(n)` (e.g. `serial.Serial`)
+            If a port, everything currently available is read in a single call.
+
+        Returns
+        -------
+        Number of bytes added.
+        """
+        if hasattr(source, 'in_waiting'):
+            n = source.in_waiting
+            if not n:
+                return 0
+            source = source.read(n)
+        new = np.frombuffer(source, dtype=np.uint8)
+        if new.size:
+            self._buf = np.concatenate((self._buf, new))
+        return new.size
+
+    def available(self):
+        """Number of complete frames ready to `take()` (resynchronizing first, if needed)."""
+        size = self.frame_size
+        buf = self._buf
+        pos = self._checked
+        if self.sync is None:
+            pos = buf.size - buf.size % size
+        else:
+            while pos + size <= buf.size:
+                n = (buf.size - pos) // size
+                match = (buf[pos:pos + n * size] & self.sync_mask) == self.sync
+                match = match.reshape((n, size))
+                valid = match[:, 0]
+                if self.exclusive:
+                    valid = valid & ~match[:, 1:].any(axis=1)
+                if valid.all():
+                    pos += n * size
+                    break
+                pos += int(np.argmin(valid)) * size  # first frame that isn't valid
+                # skip ahead to the next byte that could start a frame
+                cand = np.flatnonzero((buf[pos + 1:] & self.sync_mask) == self.sync)
+                skip = int(cand[0]) + 1 if cand.size else buf.size - pos
+                buf = np.concatenate((buf[:pos], buf[pos + skip:]))
+                self.dropped += skip
+            self._buf = buf
+        self._checked = pos
+        return pos // size
+
+    def take(self, max_frames=None):
+        """Remove and return complete frames from the buffer.
+
+        Parameters
+        ----------
+        max_frames: int, optional
+            Return at most this many frames (the rest stay buffered).
+
+        Returns
+        -------
+        (n, frame_size) uint8 array, or a 1D array of `dtype` if provided.
+        """
+        n = self.available()
+        if max_frames is not None:
+            n = min(n, max_frames)
+        nbytes = n * self.frame_size
+        frames = self._buf[:nbytes].reshape((n, self.frame_size))
+        self._buf = self._buf[nbytes:]
+        self._checked -= nbytes
+        if self.dtype is not None:
+            return np.frombuffer(frames.tobytes(), dtype=self.dtype)
+        return frames
+
+    def read(self, source, max_frames=None):
+        """`fill()` from the source, then `take()` all complete frames."""
+        self.fill(source)
+        return self.take(max_frames)
+
+    def clear(self):
+        """Discard any buffered bytes."""
+        self._buf = self._buf[:0]
+        self._checked = 0
+
+
+def backdate(t, n, period):
+    """Timestamps for a block of `n` observations, the last of which arrived at `t`,
+    assuming they were sampled every `period` seconds."""
+    return t - period * np.arange(n - 1, -1, -1)
@@ -0,0 +1,87 @@
+import numpy as np
+
+from toon.input.device import BaseDevice
+from toon.input.framing import backdate
+
+
+class HidDevice(BaseDevice):
+    """Base class for HID devices that send fixed-size reports.
+
+    Each `read()` drains all queued reports, views them as an array of `report_dtype`,
+    and hands the whole batch to `decode()`, so conversion is vectorized over the batch
+    rather than repeated per report.
+
+    Attributes
+    ----------
+    report_dtype: numpy dtype
+        Layout of one report (e.g. big-endian fields, like `np.dtype([('time', '>u4'), ...])`).
+    device_clock: str, optional
+        Field of the report holding the device's timestamp. If provided, timestamps
+        are derived from the spacing of these (see `clock_scale`), relative to the time the
+        batch was received; otherwise, reports are assumed to be evenly spaced at the
+        `sampling_frequency`.
+    clock_scale: float
+        Seconds per tick of the device clock.
+    max_reports: int
+        Most reports to drain per `read()`.
+    timeout: float
+        If `blocking`, how long (in seconds) to wait for the first report.
+
+    Notes
+    -----
+    Subclasses open the device in `enter()`, and assign it to `self.handle`. This can be
+    anything with a `read(size[, timeout_ms])` method returning the report (e.g. a `hid.device`
+    from hidapi, set to non-blocking), and is closed in `exit()` if it has a `close()` method.
+    """
+    report_dtype = None
+    device_clock = None
+    clock_scale = 1e-6
+    max_reports = 64
+    timeout = 0.1
+
+    def __init__(self, blocking=True, **kwargs):
+        super(HidDevice, self).__init__(**kwargs)
+        self.blocking = blocking
+        self.handle = None
+        self.report_dtype = np.dtype(self.report_dtype)
+        self.report_size = self.report_dtype.itemsize
+        self._raw = bytearray(self.report_size * self.max_reports)
+
+    def exit(self):
+        if hasattr(self.handle, 'close'):
+            self.handle.close()
+
+    def decode(self, reports):
+        """Convert a 1D array of `report_dtype` to a block of observations
+        (one row per report). Returns a copy of the reports by default."""
+        return reports.copy()
+
+    def timestamps(self, t, reports):
+        """Timestamps for a batch of reports, the last of which was received at `t`."""
+        if self.device_clock is None:
+            return backdate(t, reports.shape[0], 1.0 / self.sampling_frequency)
+        ticks = reports[self.device_clock]
+        # unsigned subtraction, so a wrapped device clock still gives the right spacing
+        elapsed = ticks[-1] - ticks
+        return t - elapsed * self.clock_scale
+
+    def read(self):
+        size = self.report_size
+        raw = self._raw
+        if self.blocking:
+            rep = self.handle.read(size, int(self.timeout * 1000))
+        else:
+            rep = self.handle.read(size)
+        n = 0
+        while rep:
+            if len(rep) == size:  # skip anything that isn't a full report
+                raw[n * size:(n + 1) * size] = bytes(rep)
+                n += 1
+                if n == self.max_reports:
+                    break
+            rep = self.handle.read(size)
+        if not n:
+            return None
+        t = self.clock()
+        reports = np.frombuffer(raw, dtype=self.report_dtype, count=n)
+        return self.timestamps(t, reports), self.decode(reports)
@@ -1,18 +1,65 @@
 import ctypes
 import multiprocessing as mp
 import os
+import warnings
 from collections import namedtuple
+from math import exp
 from sys import platform
+from time import sleep
 
 import numpy as np
 from numpy.ctypeslib import as_ctypes_type
 from psutil import pid_exists
 
+from toon.input import trace as tr
+from toon.input._commit import Ring, Pending
 from toon.input._tbprocess import Process
-from toon.util import priority
+from toon.input.device import Stream
+from toon.util import priority, affinity, mono_clock
+from toon.util import memory
 
 ret = namedtuple('mpdata', ['time', 'data'])
 noneret = ret(None, None)
+events = namedtuple('mpevents', ['values', 'offsets'])
+stats = namedtuple('mpstats', ['samples', 'dropped', 'flips', 'remote_blocked',
+                               'read_blocked', 'read_blocked_time'])
+bufstatus = namedtuple('mpbuffer', ['capacity', 'max_capacity', 'peak', 'headroom'])
+healthstatus = namedtuple('mphealth', ['last_sample', 'age', 'rate', 'stalled'])
+memstatus = namedtuple('mpmemory', ['locked', 'remote_locked', 'huge_pages',
+                                    'page_faults', 'remote_page_faults'])
+
+
+class Counters(ctypes.Structure):
+    """Shared counters describing throughput and contention on the double buffer.
+    The child process only writes `samples` through `remote_blocked`, the parent only writes
+    the `read_*` fields, so no extra synchronization is needed.
+    """
+    _fields_ = [('samples', ctypes.c_uint64),  # observations committed by the remote
+                ('dropped', ctypes.c_uint64),  # observations overwritten before being read
+                ('flips', ctypes.c_uint64),  # remote switched buffers because read() held the lock
+                ('remote_blocked', ctypes.c_uint64),  # remote had to wait on the other lock too
+                ('read_blocked', ctypes.c_uint64),  # read() waited on the remote
+                ('read_blocked_ns', ctypes.c_uint64)]  # total time read() spent waiting
+
+
+class Health(ctypes.Structure):
+    """Shared liveness of the device, maintained by the child process.
+    The parent only sets `stall_after` (before starting).
+    """
+    _fields_ = [('last_sample', ctypes.c_double),  # clock time of the last commit (s)
+                ('rate', ctypes.c_double),  # smoothed observations per second
+                ('stall_after', ctypes.c_double),  # no data for this long (s) counts as a stall
+                ('stalled', ctypes.c_bool)]
+
+
+# states of the child process, published in a shared status word
+STARTING, RUNNING, STOPPED, ERRORED = range(4)
+state_names = ('starting', 'running', 'stopped', 'errored')
+# while the child reports RUNNING, only check that it is really alive every this many calls
+# to `check_error()` (in case it was killed without a chance to update the status)
+LIVENESS_INTERVAL = 64
+
+RATE_TAU = 1.0  # time constant (s) of the smoothed rate estimate
 
 
 def shared_to_numpy(mp_arr, dims):
@@ -27,23 +74,79 @@ def shared_to_numpy(mp_arr, dims):
 class MpDevice(object):
     """Creates and manages a process for polling an input device."""
 
-    def __init__(self, device, buffer_len=None, use_views=False):
+    def __init__(self, device, buffer_len=None, use_views=False, trace=False, cpus=None,
+                 lock_memory=False, huge_pages=False, arena_len=None, max_buffer_len=None,
+                 warmup=1.0, headroom=2.0, stall_multiple=10, max_restarts=0,
+                 restart_backoff=0.01):
         """Create a new MpDevice.
 
         Parameters
         ----------
         device: object (derived from toon.input.BaseDevice)
             Input device object.
-        buffer_len: int, optional
+        buffer_len: int or 'auto', optional
             Overrides the device's sampling_frequency when specifing the size of the
-            circular buffer.
+            circular buffer. If 'auto', `max_buffer_len` observations are allocated, and the
+            capacity in use (how many are kept before the oldest are overwritten) starts at
+            the default (one second) and grows as reads get larger, e.g. after a stall or if
+            the device runs faster than its sampling_frequency (see `buffer_status`).
         use_views: bool, optional
             Return views (False by default; faster, but more error-prone) or copy data returned by `read()`.
+        trace: bool or int, optional
+            Record timestamped events from both processes (see `export_trace()`).
+            If an int, the number of events to keep per process.
+        cpus: iterable of int, optional
+            CPUs to pin the child process to (see `toon.util.affinity`). A warning is
+            raised if the calling process may also run on any of these CPUs.
+        lock_memory: bool, optional
+            Touch every page of the shared buffers and lock them into RAM, in both processes,
+            so neither side takes page faults on first access (see `memory_status`).
+        huge_pages: bool, optional
+            Ask for the shared buffers to be backed by transparent huge pages (Linux only).
+        arena_len: int, optional
+            For devices with `variable_length` observations, the number of elements to
+            preallocate for the payloads (defaults to 16 per observation).
+        max_buffer_len: int, optional
+            With `buffer_len='auto'`, the number of observations to allocate, and the
+            most the capacity can grow to (defaults to 8 seconds worth, based on the sampling_frequency).
+        warmup: float, optional
+            With `buffer_len='auto'`, how long (in seconds) to observe reads before settling
+            on a capacity (never below the default one second).
+        headroom: float, optional
+            With `buffer_len='auto'`, the capacity is kept at (at least) this multiple of the
+            most observations seen in a single read, growing as soon as a read exceeds it.
+        stall_multiple: float, optional
+            The device is considered stalled (see `health`) if no observations arrive within
+            this many expected sampling periods (based on the sampling_frequency). None disables this.
+        max_restarts: int, optional
+            If the device raises an exception, re-enter it in a fresh child process (reusing the
+            shared buffers) up to this many times before raising the exception from `read()`.
+        restart_backoff: float, optional
+            Seconds to wait before the first restart, doubled for each subsequent restart.
         """
         self.device = device
         self.buffer_len = buffer_len
+        self.arena_len = arena_len
+        self.auto_size = buffer_len == 'auto'
+        self.warmup = warmup
+        self.headroom = headroom
+        self._t_start = None
+        self.max_restarts = max_restarts
+        self.restart_backoff = restart_backoff
+        self.restarts = 0
         self._use_views = use_views
         self.process = None
+        self.cpus = None if cpus is None else sorted(set(cpus))
+        self.lock_memory = lock_memory
+        self._locked = False
+        self._huge_pages = False
+        self._remote_locked = mp.RawValue(ctypes.c_bool, False)
+        self._trace = None
+        self._remote_trace = None
+        if trace:
+            size = 65536 if trace is True else trace
+            self._trace = tr.TraceRing(size)
+            self._remote_trace = tr.TraceRing(size)
         # For Macs, use spawn (interaction with OpenGL or ??)
         # Windows only does spawn
         if platform in ['darwin', 'win32']:
@@ -53,67 +156,63 @@ class MpDevice(object):
             except (AttributeError, RuntimeError):
                 pass  # already started a process, or on python2
 
-        n_buffers = 2
-        # make one lock per buffer
-        self.shared_locks = [mp.Lock() for i in range(n_buffers)]
         self.remote_ready = mp.Event()  # signal to main process that remote is done setup
         self.kill_remote = mp.Event()  # signal to remote process to die
-        self.current_buffer_index = mp.RawValue(ctypes.c_bool, 0)
-
-        # figure out number of observations to save between reads
-        nrow = 100  # default (100 Hz)
-        # if we have a sampling_frequency, allocate 1s worth
-        # should be enough wiggle room for 60Hz refresh rate
-        if self.device.sampling_frequency:
-            nrow = self.device.sampling_frequency
-        if self.buffer_len:  # buffer_len overcomes all
-            nrow = self.buffer_len
-        nrow = int(max(nrow, 1))  # make sure we have at least one row
-
-        # preallocate data
-        # we have a double buffer sort of thing going on,
-        # so we need two of everything
-        self._data = []
+        self._counters = mp.RawValue(Counters)
+        self._counters_base = Counters()  # parent-side snapshot, see `reset_stats()`
+        self._health = mp.RawValue(Health)
+        self._status = mp.RawValue(ctypes.c_int, STOPPED)
+        self._checks = 0
+        if stall_multiple and self.device.sampling_frequency:
+            self._health.stall_after = stall_multiple / self.device.sampling_frequency
+
         time_type = as_ctypes_type(type(self.device.clock()))
-        for lck in self.shared_locks:
-            # make mp version
-            is_scalar = False
-            if self.device.shape == (1,):
-                new_dim = (nrow,)
-                is_scalar = True
-            else:
-                new_dim = (nrow,) + self.device.shape
-            flat_dim = int(np.product(new_dim))
-            ctype = self.device.ctype
-            # Structures get padding when passing through this,
-            # so only run on non-Structures
-            if isinstance(ctype, list):
-                ctype = as_ctypes_type(ctype)
-                globals()['struct'] = ctype
-            elif not issubclass(ctype, ctypes.Structure):
-                ctype = as_ctypes_type(ctype)
-            mp_arr = mp.RawArray(ctype, flat_dim)
-            np_arr = shared_to_numpy(mp_arr, new_dim)
-            t_mp_arr = mp.RawArray(time_type, nrow)
-            t_np_arr = shared_to_numpy(t_mp_arr, nrow)
-            counter = mp.RawValue(ctypes.c_uint, 0)
-            # generate local version
-            local_arr = np.empty_like(np_arr)
-            t_local_arr = np.empty_like(t_np_arr)
-            if is_scalar:
-                local_arr = np.squeeze(local_arr)
-            # special case for buffer size of 1 and scalar data
-            if local_arr.shape == ():
-                local_arr.shape = (1,)
-            data_pack = {'mp_data': mp_arr, 'np_data': np_arr,
-                         'mp_time': t_mp_arr, 'np_time': t_np_arr,
-                         'counter': counter, 'lock': lck}
-            self._data.append(data_pack)
-
-        # make local versions to copy the data into
-        self._local_arr = local_arr
-        self._t_local_arr = t_local_arr
+        # one stream unless the device declares several
+        specs = self.device.streams or {None: Stream(self.device.ctype, self.device.shape,
+                                                     self.device.sampling_frequency,
+                                                     self.device.variable_length)}
+        self._streams = []
+        for name, spec in specs.items():
+            # figure out number of observations to save between reads
+            nrow = 100  # default (100 Hz)
+            # if we have a sampling_frequency, allocate 1s worth
+            # should be enough wiggle room for 60Hz refresh rate
+            if spec.sampling_frequency or self.device.sampling_frequency:
+                nrow = spec.sampling_frequency or self.device.sampling_frequency
+            min_capacity = int(max(nrow, 1))
+            if self.auto_size:
+                # reserve room to grow, starting from the default
+                nrow = max_buffer_len or 8 * nrow
+            elif self.buffer_len:  # buffer_len overcomes all
+                nrow = self.buffer_len
+            nrow = int(max(nrow, 1))  # make sure we have at least one row
+            arena = None
+            if spec.variable_length:
+                arena = int(max(self.arena_len or 16 * nrow, 1))
+            stream = make_stream(nrow, spec.shape, spec.ctype, time_type, arena_len=arena)
+            stream['name'] = name
+            if self.auto_size:
+                stream['min_capacity'] = stream['capacity'] = min(min_capacity, nrow)
+                for dat in stream['data']:
+                    dat['capacity'].value = stream['capacity']
+            self._streams.append(stream)
+        self._multi = None
+        if self.device.streams:
+            self._multi = namedtuple('mpstreams', list(specs))
+        # kept for backwards compatibility
+        self._data = self._streams[0]['data']
+        self.shared_locks = self._streams[0]['locks']
+        self.current_buffer_index = self._streams[0]['buffer_index']
         self.device.local = True
+        # lets `read()` spot an empty buffer without any other bookkeeping
+        # (one stream, no tracing or capacity changes to account for)
+        self._pending = None
+        if self._multi is None and not self._trace and not self.auto_size:
+            self._pending = Pending(self._streams[0])
+
+        if huge_pages:
+            self._huge_pages = all([memory.advise_huge_pages(seg)
+                                    for strm in self._streams for seg in segments(strm)])
 
     def start(self):
         """Start polling from the device on the child process.
@@ -130,13 +229,33 @@ class MpDevice(object):
         """
         if not self.device.local:
             raise RuntimeError('MpDevice is already started.')
+        if self.lock_memory and not self._locked:
+            self._locked = all([lock_segments(segments(strm)) for strm in self._streams])
+        self.restarts = 0
+        self._launch()
+        self._t_start = mono_clock.get_time()
+        if self.cpus is not None:
+            shared = set(self.affinity or []) & set(affinity() or [])
+            if shared:
+                warnings.warn('The device process shares CPU(s) %s with the calling process.' %
+                              sorted(shared))
+
+    def _launch(self):
+        """Create the child process and wait until the device is entered."""
+        self._status.value = STARTING
         self.process = Process(target=remote,
                                kwargs={'dev': self.device,
-                                       'data': self._data,
+                                       'streams': self._streams,
                                        'remote_ready': self.remote_ready,
                                        'kill_remote': self.kill_remote,
                                        'parent_pid': os.getpid(),
-                                       'current_buffer_index': self.current_buffer_index})
+                                       'counters': self._counters,
+                                       'cpus': self.cpus,
+                                       'locked': self._remote_locked if self.lock_memory else None,
+                                       'trace': self._remote_trace,
+                                       'health': self._health,
+                                       'status': self._status,
+                                       'clock': mono_clock})
 
         self.process.daemon = True
         self.process.start()
@@ -144,6 +263,38 @@ class MpDevice(object):
         self.remote_ready.wait()  # block until child process is ready
         self.device.local = False  # try to prevent local access to the device
 
+    def _restart(self):
+        """Start a fresh child process after a crash, reusing the shared buffers and counters."""
+        sleep(self.restart_backoff * 2 ** self.restarts)
+        self.restarts += 1
+        self.process.join()
+        for strm in self._streams:
+            strm['seq'].value += 1  # leave a gap in the sequence numbers
+        self.remote_ready.clear()
+        self.device.local = True  # so the new child can enter the device
+        self._launch()
+
+    @property
+    def status(self):
+        """State of the child process, as it last reported: 'starting', 'running',
+        'stopped', or 'errored'."""
+        return state_names[self._status.value]
+
+    @property
+    def affinity(self):
+        """CPUs the child process is allowed to run on (None if unknown or not running)."""
+        if self.process is None or not self.process.is_alive():
+            return None
+        return affinity(pid=self.process.pid)
+
+    def pending(self):
+        """Whether any observations are waiting to be read (checked without taking the locks)."""
+        self.check_error()
+        for strm in self._streams:
+            if strm['data'][strm['buffer_index'].value]['counter'].value:
+                return True
+        return False
+
     def read(self):
         """Retrieve all observations that have occurred since the last read.
         Notes
@@ -159,56 +310,228 @@ class MpDevice(object):
 
         Returns
         -------
-        Named tuple (time, data), or None if there is no data.
+        Named tuple (time, data), or None if there is no data. For devices with
+        `variable_length` observations, `data` is itself a named tuple (values, offsets),
+        where observation `i` is `values[offsets[i]:offsets[i + 1]]`.
+        For devices with several `streams`, a named tuple with one field per stream,
+        each either (time, data) or None.
 
         Raises
         ------
         May raise an exception if one has occurred on the child process since the last read.
         """
-        self.check_error()
-        # get the current buffer (either 0 or 1)
-        current_buffer_index = self.current_buffer_index.value
-        # this might block, if the remote is currently writing data
-        current_data = self._data[current_buffer_index]
-        with current_data['lock']:
-            local_count = current_data['counter'].value
-            if local_count > 0:
-                current_data['counter'].value = 0  # start writing from the top of the array
-                t_out = self._t_local_arr[:local_count]
-                data_out = self._local_arr[:local_count]
-                data_out[:] = current_data['np_data'][:local_count]
-                t_out[:] = current_data['np_time'][:local_count]
-            else:
-                return None
-        # return time, data views (fast)
-        if self._use_views:
-            return ret(t_out, data_out)
-        # otherwise, return copies
-        return ret(np.copy(t_out), np.copy(data_out))
+        # same as check_error(), without the call while the child reports that it's running
+        checks = self._checks + 1
+        if checks < LIVENESS_INTERVAL and self._status.value == RUNNING:
+            self._checks = checks
+        else:
+            self.check_error()
+        pending = self._pending
+        if pending is not None and not pending():
+            # nothing to read, so don't bother with the lock (see `read_stream()`)
+            self._streams[0]['last_seq'] = None
+            return None
+        trace = self._trace
+        if trace:
+            trace.begin(tr.READ)
+        if self._multi is None:
+            res = read_stream(self._streams[0], self._counters, trace, self._use_views)
+        else:
+            res = self._multi(*[read_stream(strm, self._counters, trace, self._use_views)
+                                for strm in self._streams])
+        if self.auto_size:
+            for strm in self._streams:
+                self._grow_capacity(strm)
+        if trace:
+            trace.end(tr.READ)
+        return res
+
+    def _grow_capacity(self, stream):
+        """Pick a new capacity for a stream, based on the reads so far.
+        It's applied by `read_stream()`, the next time each buffer is empty."""
+        want = int(np.ceil(self.headroom * stream['last_count']))
+        if stream['saturated'] or want > stream['capacity']:
+            # full (data may be lost) or getting there: grow right away
+            stream['capacity'] = min(max(2 * stream['capacity'], want), stream['max_capacity'])
+        elif not stream['settled'] and mono_clock.get_time() - self._t_start >= self.warmup:
+            # let go of what startup took, but keep at least the default
+            stream['capacity'] = int(min(max(np.ceil(self.headroom * stream['peak']),
+                                             stream['min_capacity']),
+                                         stream['max_capacity']))
+            stream['settled'] = True
+
+    @property
+    def sequence(self):
+        """Sequence numbers of the observations returned by the last `read()` (None if there
+        were none), or a named tuple of these for devices with several `streams`.
+        Gaps indicate observations that were overwritten before being read, or a restart
+        of the device (see `max_restarts`).
+        """
+        if self._multi is None:
+            return self._streams[0]['last_seq']
+        return self._multi(*[strm['last_seq'] for strm in self._streams])
+
+    @property
+    def buffer_status(self):
+        """Size and usage of the shared buffers.
+
+        Returns
+        -------
+        Named tuple with fields (or, for devices with several `streams`, a named tuple of these):
+
+        - capacity: Number of observations each buffer currently holds before overwriting.
+        - max_capacity: Number of observations allocated.
+        - peak: Most observations returned by a single `read()` so far.
+        - headroom: Fraction of the capacity left unused at that peak.
+        """
+        out = [bufstatus(strm['capacity'], strm['max_capacity'], strm['peak'],
+                         1.0 - strm['peak'] / strm['capacity']) for strm in self._streams]
+        if self._multi is None:
+            return out[0]
+        return self._multi(*out)
 
     def clear(self):
         """Discard all pending observations."""
         self.check_error()
-        current_buffer_index = self.current_buffer_index.value
-        current_data = self._data[current_buffer_index]
-        with current_data['lock']:
-            current_data['counter'].value = 0
+        for strm in self._streams:
+            clear_stream(strm)
+
+    @property
+    def stats(self):
+        """Counters describing throughput and contention between `read()` and the child process.
+
+        Returns
+        -------
+        Named tuple with fields:
+
+        - samples: Number of observations committed by the child.
+        - dropped: Number of observations overwritten before they were read.
+        - flips: Number of times the child switched buffers because `read()` held the lock.
+        - remote_blocked: Number of times the child then had to wait for the other buffer.
+        - read_blocked: Number of times `read()` had to wait for the child.
+        - read_blocked_time: Total time (in seconds) `read()` spent waiting.
+        """
+        c = self._counters
+        b = self._counters_base
+        return stats(c.samples - b.samples, c.dropped - b.dropped, c.flips - b.flips,
+                     c.remote_blocked - b.remote_blocked, c.read_blocked - b.read_blocked,
+                     (c.read_blocked_ns - b.read_blocked_ns) * 1e-9)
+
+    @property
+    def memory_status(self):
+        """Whether the shared buffers are locked into RAM and how many page faults
+        each process has taken so far.
+
+        Returns
+        -------
+        Named tuple with fields:
+
+        - locked: Buffers are locked in the calling process.
+        - remote_locked: Buffers are locked in the child process.
+        - huge_pages: The kernel accepted the request for transparent huge pages.
+        - page_faults: (minor, major) page faults of the calling process.
+        - remote_page_faults: (minor, major) page faults of the child process, or None if not running.
+
+        Where the OS reports it (Linux), `locked` and `remote_locked` are checked against the
+        memory each process currently has locked, rather than just whether locking succeeded
+        at the start.
+        """
+        # the buffers don't overlap, so they need at least this much locked memory
+        need = sum([ctypes.sizeof(seg) for strm in self._streams for seg in segments(strm)])
+        locked = self._locked
+        remote_locked = self._remote_locked.value
+        remote_faults = None
+        vm_locked = memory.locked_bytes()
+        if locked and vm_locked is not None:
+            locked = vm_locked >= need
+        if self.process is not None and self.process.is_alive():
+            remote_faults = memory.page_faults(self.process.pid)
+            vm_locked = memory.locked_bytes(self.process.pid)
+            if remote_locked and vm_locked is not None:
+                remote_locked = vm_locked >= need
+        return memstatus(locked, remote_locked, self._huge_pages,
+                         memory.page_faults(), remote_faults)
+
+    @property
+    def health(self):
+        """Liveness of the device, as seen by the child process.
+
+        Returns
+        -------
+        Named tuple with fields:
+
+        - last_sample: Time (per toon.util.mono_clock) of the most recent observation,
+          or of the start of the device if there have been none.
+        - age: Seconds since then.
+        - rate: Smoothed rate of observations, per second.
+        - stalled: True if no observations arrived within `stall_multiple` expected periods.
+
+        Notes
+        -----
+        The child only flags a stall while polling, so a device blocked inside `read()`
+        is also flagged here based on `age`.
+        """
+        h = self._health
+        last = h.last_sample
+        age = mono_clock.get_time() - last
+        stalled = h.stalled or (h.stall_after > 0 and age > h.stall_after)
+        return healthstatus(last, age, h.rate, stalled)
+
+    def reset_stats(self):
+        """Zero the counters reported by `stats`.
+
+        The shared counters keep running (the child process is their only writer);
+        this takes a snapshot that later values are reported relative to.
+        """
+        ctypes.memmove(ctypes.addressof(self._counters_base), ctypes.addressof(self._counters),
+                       ctypes.sizeof(Counters))
 
     def check_error(self):
         """See if any exceptions have occurred on the child process, or whether
         the device was already closed.
+
+        Notes
+        -----
+        While the child process reports that it's running, this only reads the shared
+        status word (and checks that the process is alive every so often).
         """
+        if self._status.value == RUNNING:
+            self._checks += 1
+            if self._checks < LIVENESS_INTERVAL:
+                return
+            self._checks = 0
         if self.process:
             if not self.process.is_alive():
                 if self.process.exception:
                     err, traceback = self.process.exception
                     print(traceback)
+                    if self.restarts < self.max_restarts and not self.kill_remote.is_set():
+                        warnings.warn('Restarting device after %r (%i of %i).' %
+                                      (err, self.restarts + 1, self.max_restarts))
+                        self._restart()
+                        return
                     raise err
                 else:
                     raise RuntimeError('MpDevice is closed.')
         else:
             raise RuntimeError('MpDevice has not been started yet.')
 
+    def export_trace(self, path=None):
+        """Export the recorded events of both processes in the Chrome trace format.
+
+        Parameters
+        ----------
+        path: str, optional
+            If provided, write the JSON to this file (open with chrome://tracing or Perfetto).
+
+        Returns
+        -------
+        Dictionary in the Chrome trace event format.
+        """
+        if not self._trace:
+            raise RuntimeError('MpDevice was created without tracing enabled.')
+        return tr.export_chrome([self._remote_trace, self._trace], path)
+
     def stop(self):
         """Stop reading from the device and kill the child process.
         Notes
@@ -217,6 +540,8 @@ class MpDevice(object):
         """
         self.kill_remote.set()
         self.process.join(timeout=1)
+        if self._status.value != ERRORED:
+            self._status.value = STOPPED
         self.device.local = True
         self.kill_remote.clear()
         self.remote_ready.clear()
@@ -229,69 +554,449 @@ class MpDevice(object):
         self.stop()
 
 
-def process_data(shared_time, shared_data, local_time, local_data, shared_counter, is_struct):
+def read_all(devices, timeout=0, interval=1e-4):
+    """Read from several MpDevices at once.
+
+    Parameters
+    ----------
+    devices: sequence of MpDevice
+        Started devices.
+    timeout: float or None, optional
+        If none of the devices have new data, keep polling for up to this many seconds
+        (None waits indefinitely). Defaults to 0 (a single pass).
+    interval: float, optional
+        Seconds to sleep between polls while waiting.
+
+    Returns
+    -------
+    List with one element per device: the result of its `read()`, or None if it had no new data.
+
+    Notes
+    -----
+    Devices without new data are skipped after checking their commit counters, so
+    the cost of a pass scales with the data that actually arrived. Skipped devices
+    keep the `sequence` of their last successful read.
+    """
+    if timeout is not None:
+        deadline = mono_clock.get_time() + timeout
+    while True:
+        out = [dev.read() if dev.pending() else None for dev in devices]
+        if any(res is not None for res in out):
+            return out
+        if timeout is not None and mono_clock.get_time() >= deadline:
+            return out
+        sleep(interval)
+
+
+def make_stream(nrow, shape, ctype, time_type, arena_len=None):
+    """Allocate the shared double buffer for a stream of observations.
+
+    Parameters
+    ----------
+    nrow: int
+        Number of observations per buffer.
+    shape: tuple
+        Shape of each observation (or of each element, for variable-length observations).
+    ctype:
+        Python type, numpy dtype, ctype, or ctypes.Structure of the data.
+    time_type:
+        ctype of the timestamps.
+    arena_len: int, optional
+        If provided, observations are variable-length sequences of elements, packed
+        into an arena of this many elements with an offset index.
+
+    Returns
+    -------
+    Dictionary describing the stream (pass to `commit()` and `read_stream()`).
+    """
+    locks = [mp.Lock() for i in range(2)]  # one lock per buffer
+    is_scalar = shape == (1,)
+    # Structures get padding when passing through this,
+    # so only run on non-Structures
+    if isinstance(ctype, list):
+        ctype = as_ctypes_type(ctype)
+        globals()['struct'] = ctype
+    elif not issubclass(ctype, ctypes.Structure):
+        ctype = as_ctypes_type(ctype)
+    # rows of data (fixed-size observations), or elements in the arena (variable-length)
+    n_elements = nrow if arena_len is None else arena_len
+    new_dim = (n_elements,) if is_scalar else (n_elements,) + shape
+    flat_dim = int(np.prod(new_dim))
+    # preallocate data
+    # we have a double buffer sort of thing going on,
+    # so we need two of everything
+    data = []
+    for lck in locks:
+        mp_arr = mp.RawArray(ctype, flat_dim)
+        t_mp_arr = mp.RawArray(time_type, nrow)
+        s_mp_arr = mp.RawArray(ctypes.c_uint64, nrow)
+        data_pack = {'mp_data': mp_arr, 'np_data': shared_to_numpy(mp_arr, new_dim),
+                     'mp_time': t_mp_arr, 'np_time': shared_to_numpy(t_mp_arr, nrow),
+                     'mp_seq': s_mp_arr, 'np_seq': shared_to_numpy(s_mp_arr, nrow),
+                     'counter': mp.RawValue(ctypes.c_uint, 0), 'lock': lck,
+                     'capacity': mp.RawValue(ctypes.c_uint, nrow)}
+        if arena_len is not None:
+            o_mp_arr = mp.RawArray(ctypes.c_int64, nrow + 1)
+            data_pack['mp_offsets'] = o_mp_arr
+            data_pack['np_offsets'] = shared_to_numpy(o_mp_arr, nrow + 1)
+        data.append(data_pack)
+
+    # make local versions to copy the data into
+    local_arr = np.empty_like(data_pack['np_data'])
+    if is_scalar:
+        local_arr = np.squeeze(local_arr)
+    # special case for buffer size of 1 and scalar data
+    if local_arr.shape == ():
+        local_arr.shape = (1,)
+    stream = {'data': data, 'locks': locks,
+              'buffer_index': mp.RawValue(ctypes.c_bool, 0),
+              'seq': mp.RawValue(ctypes.c_uint64, 0),  # sequence number of the next observation
+              'is_struct': data_pack['np_data'].dtype.type == np.void,
+              'ragged': arena_len is not None,
+              # parent-side bookkeeping for buffer sizing
+              'capacity': nrow, 'min_capacity': nrow, 'max_capacity': nrow,
+              'peak': 0, 'last_count': 0, 'saturated': False, 'settled': False,
+              'local_data': local_arr,
+              'local_time': np.empty_like(data_pack['np_time']),
+              'local_seq': np.empty_like(data_pack['np_seq']),
+              'last_seq': None}
+    if arena_len is not None:
+        stream['local_offsets'] = np.empty_like(data_pack['np_offsets'])
+    return stream
+
+
+def attach(stream):
+    """Re-generate the connection between the mp and np arrays (e.g. on the child process)."""
+    for d in stream['data']:
+        d['np_data'] = shared_to_numpy(d['mp_data'], d['np_data'].shape)
+        d['np_time'] = shared_to_numpy(d['mp_time'], d['np_time'].shape)
+        d['np_seq'] = shared_to_numpy(d['mp_seq'], d['np_seq'].shape)
+        if stream['ragged']:
+            d['np_offsets'] = shared_to_numpy(d['mp_offsets'], d['np_offsets'].shape)
+
+
+def attach_rings(stream, counters):
+    """Set up the compiled commit path for a stream of fixed-size observations
+    (variable-length observations stay on `process_event`). Call after `attach()`."""
+    if not stream['ragged']:
+        stream['rings'] = [Ring(pack, stream['seq'], counters) for pack in stream['data']]
+
+
+def segments(stream):
+    """All of the shared arrays backing a stream."""
+    segs = []
+    for d in stream['data']:
+        segs.extend([d['mp_data'], d['mp_time'], d['mp_seq']])
+        if stream['ragged']:
+            segs.append(d['mp_offsets'])
+    return segs
+
+
+def lock_segments(segs):
+    """Prefault and lock shared arrays into RAM. Returns True if all were locked."""
+    locked = True
+    for seg in segs:
+        memory.prefault(seg)
+        locked = memory.lock(seg) and locked
+    return locked
+
+
+def read_stream(stream, counters, trace=None, use_views=False):
+    """Copy all pending observations out of a stream (see `MpDevice.read()`)."""
+    # get the current buffer (either 0 or 1)
+    current_data = stream['data'][stream['buffer_index'].value]
+    if current_data['counter'].value == 0:
+        # nothing to read, so don't bother with the lock (anything
+        # committed in the meantime is picked up next time)
+        stream['saturated'] = False
+        stream['last_seq'] = None
+        return None
+    if trace:
+        trace.begin(tr.READ_LOCK)
+    # this might block, if the remote is currently writing data
+    lck = current_data['lock']
+    if not lck.acquire(block=False):
+        t0 = mono_clock.get_time_ns()
+        lck.acquire()
+        counters.read_blocked += 1
+        counters.read_blocked_ns += mono_clock.get_time_ns() - t0
+    try:
+        if trace:
+            trace.end(tr.READ_LOCK)
+        local_count = current_data['counter'].value
+        stream['saturated'] = local_count >= current_data['capacity'].value
+        stream['last_count'] = local_count
+        if local_count > stream['peak']:
+            stream['peak'] = local_count
+        if local_count == 0:
+            # safe point to change the capacity, the buffer is empty & locked
+            current_data['capacity'].value = stream['capacity']
+            stream['last_seq'] = None
+            return None
+        if trace:
+            trace.begin(tr.READ_COPY)
+        current_data['counter'].value = 0  # start writing from the top of the array
+        current_data['capacity'].value = stream['capacity']
+        t_out = stream['local_time'][:local_count]
+        t_out[:] = current_data['np_time'][:local_count]
+        s_out = stream['local_seq'][:local_count]
+        s_out[:] = current_data['np_seq'][:local_count]
+        if stream['ragged']:
+            o_out = stream['local_offsets'][:local_count + 1]
+            o_out[:] = current_data['np_offsets'][:local_count + 1]
+            data_out = stream['local_data'][:o_out[-1]]
+        else:
+            data_out = stream['local_data'][:local_count]
+        data_out[:] = current_data['np_data'][:data_out.shape[0]]
+        if trace:
+            trace.end(tr.READ_COPY)
+    finally:
+        lck.release()
+    if not use_views:  # return copies
+        t_out = np.copy(t_out)
+        s_out = np.copy(s_out)
+        data_out = np.copy(data_out)
+        if stream['ragged']:
+            o_out = np.copy(o_out)
+    # otherwise, return time, data views (fast)
+    stream['last_seq'] = s_out
+    if stream['ragged']:
+        return ret(t_out, events(data_out, o_out))
+    return ret(t_out, data_out)
+
+
+def clear_stream(stream):
+    current_data = stream['data'][stream['buffer_index'].value]
+    with current_data['lock']:
+        current_data['counter'].value = 0
+
+
+def process_data(shared_time, shared_data, shared_seq, local_time, local_data, shared_counter,
+                 is_struct, counters, capacity, seq):
     next_index = shared_counter.value
+    counters.samples += 1
     if is_struct:
         # np.ctypeslib.as_array is ~30x slower?
         local_data = np.frombuffer(local_data, dtype=shared_data.dtype)
-    if next_index < shared_time.shape[0]:
+    if next_index < capacity:
         shared_time[next_index] = local_time
         shared_data[next_index] = local_data
+        shared_seq[next_index] = seq.value
         shared_counter.value += 1
     else:  # ring buffer ish, see benchmarks https://github.com/aforren1/toon/issues/77
-        shared_time[:-1] = shared_time[1:]
-        shared_time[-1] = local_time
-        shared_data[:-1] = shared_data[1:]
-        shared_data[-1] = local_data
+        shared_time[:capacity - 1] = shared_time[1:capacity]
+        shared_time[capacity - 1] = local_time
+        shared_data[:capacity - 1] = shared_data[1:capacity]
+        shared_data[capacity - 1] = local_data
+        shared_seq[:capacity - 1] = shared_seq[1:capacity]
+        shared_seq[capacity - 1] = seq.value
+        counters.dropped += 1
+    seq.value += 1
+
+
+def process_block(shared_time, shared_data, shared_seq, local_time, local_data, shared_counter,
+                  is_struct, counters, capacity, seq):
+    """Like `process_data`, but for a block of observations at once
+    (`local_time` is a 1D array, and `local_data` has as many rows)."""
+    n = local_time.shape[0]
+    if is_struct and not isinstance(local_data, np.ndarray):
+        local_data = np.frombuffer(local_data, dtype=shared_data.dtype)
+    local_data = np.asarray(local_data).reshape((n,) + shared_data.shape[1:])
+    counters.samples += n
+    first = seq.value
+    seq.value += n
+    if n > capacity:  # only the newest observations fit
+        counters.dropped += n - capacity
+        local_time = local_time[n - capacity:]
+        local_data = local_data[n - capacity:]
+        first += n - capacity
+        n = capacity
+    count = shared_counter.value
+    overflow = count + n - capacity
+    if overflow > 0:  # discard the oldest observations in the buffer
+        count -= overflow
+        shared_time[:count] = shared_time[overflow:overflow + count]
+        shared_data[:count] = shared_data[overflow:overflow + count]
+        shared_seq[:count] = shared_seq[overflow:overflow + count]
+        counters.dropped += overflow
+    shared_time[count:count + n] = local_time
+    shared_data[count:count + n] = local_data
+    shared_seq[count:count + n] = np.arange(first, first + n, dtype=np.uint64)
+    shared_counter.value = count + n
 
 
-def remote(dev, data, remote_ready, kill_remote, parent_pid, current_buffer_index):
-    # from timeit import default_timer
-    for d in data:
+def process_event(shared_time, shared_data, shared_seq, shared_offsets, local_time, local_data,
+                  shared_counter, is_struct, counters, capacity, seq):
+    """Like `process_data`, but for variable-length observations packed into an arena."""
+    counters.samples += 1
+    if is_struct or isinstance(local_data, (bytes, bytearray, memoryview)):
+        local_data = np.frombuffer(local_data, dtype=shared_data.dtype)
+    else:
+        local_data = np.asarray(local_data, dtype=shared_data.dtype)
+    local_data = local_data.reshape((-1,) + shared_data.shape[1:])
+    n = local_data.shape[0]
+    if n > shared_data.shape[0]:
+        raise ValueError('Observation of length %i does not fit into the arena (%i).' %
+                         (n, shared_data.shape[0]))
+    count = shared_counter.value
+    shared_offsets[0] = 0
+    end = shared_offsets[count]
+    if count >= capacity or end + n > shared_data.shape[0]:
+        # out of room, so discard just enough of the oldest observations
+        drop = max(count + 1 - capacity,
+                   np.searchsorted(shared_offsets[:count + 1], end + n - shared_data.shape[0]))
+        start = shared_offsets[drop]
+        shared_data[:end - start] = shared_data[start:end]
+        shared_offsets[:count - drop + 1] = shared_offsets[drop:count + 1] - start
+        shared_time[:count - drop] = shared_time[drop:count]
+        shared_seq[:count - drop] = shared_seq[drop:count]
+        count -= drop
+        end -= start
+        counters.dropped += drop
+    shared_data[end:end + n] = local_data
+    shared_time[count] = local_time
+    shared_seq[count] = seq.value
+    shared_offsets[count + 1] = end + n
+    shared_counter.value = count + 1
+    seq.value += 1
+
+
+def commit(stream, device_dat, counters, trace=None):
+    """Write a (time, data) tuple, or list of them, into the current buffer of a stream.
+    A (times, data) tuple where `times` is a 1D array commits a block of observations."""
+    if trace:
+        trace.begin(tr.LOCK)
+    buffer_index = stream['buffer_index']
+    data = stream['data']
+    # lock magicks
+    # test whether the current buffer is accessible
+    index = buffer_index.value
+    current_data = data[index]
+    lck = current_data['lock']
+    success = lck.acquire(block=False)
+    if not success:
+        index = not index
+        buffer_index.value = index
+        current_data = data[index]
+        lck = current_data['lock']
+        counters.flips += 1
+        if trace:
+            trace.instant(tr.FLIP)
+        # manual lock handling
+        if not lck.acquire(block=False):
+            counters.remote_blocked += 1
+            lck.acquire()
+    if trace:
+        trace.end(tr.LOCK)
+        trace.begin(tr.PROCESS_DATA)
+    try:
+        if type(device_dat) is tuple and type(device_dat[0]) is np.ndarray:
+            # a block of observations, with an array of times
+            if stream['ragged']:
+                raise ValueError('Variable-length observations cannot be committed as a block.')
+            process_block(current_data['np_time'], current_data['np_data'], current_data['np_seq'],
+                          device_dat[0], device_dat[1], current_data['counter'], stream['is_struct'],
+                          counters, current_data['capacity'].value, stream['seq'])
+            return
+        rings = stream.get('rings')
+        if rings is not None:  # compiled path (see `attach_rings()`)
+            if isinstance(device_dat, list):
+                rings[index].write_many(device_dat)
+            else:
+                rings[index].write(device_dat[0], device_dat[1])
+            return
+        shared_time = current_data['np_time']
+        shared_data = current_data['np_data']
+        shared_counter = current_data['counter']
+        capacity = current_data['capacity'].value
+        shared_seq = current_data['np_seq']
+        seq = stream['seq']
+        is_struct = stream['is_struct']
+        if not isinstance(device_dat, list):
+            device_dat = [device_dat]
+        if stream['ragged']:
+            shared_offsets = current_data['np_offsets']
+            for dat in device_dat:
+                process_event(shared_time, shared_data, shared_seq, shared_offsets,
+                              dat[0], dat[1], shared_counter, is_struct, counters, capacity, seq)
+        else:
+            for dat in device_dat:
+                process_data(shared_time, shared_data, shared_seq,
+                             dat[0], dat[1], shared_counter, is_struct, counters, capacity, seq)
+    finally:
+        lck.release()
+        if trace:
+            trace.end(tr.PROCESS_DATA)
+
+
+def update_health(health, now, n):
+    """Record `n` new observations at time `now` in the shared Health struct."""
+    dt = now - health.last_sample
+    if n > 0 and dt > 0:
+        # exponential smoothing with a fixed time constant, so irregular arrivals are weighted fairly
+        alpha = 1.0 - exp(-dt / RATE_TAU)
+        health.rate += alpha * (n / dt - health.rate)
+    health.last_sample = now
+    health.stalled = False
+
+
+def remote(dev, streams, remote_ready, kill_remote, parent_pid, counters,
+           cpus=None, locked=None, trace=None, health=None, clock=mono_clock, status=None):
+    for strm in streams:
         # need to re-generate connection between mp and np arrays
-        dims = d['np_data'].shape
-        d['np_data'] = shared_to_numpy(d['mp_data'], dims)
-        d['np_time'] = shared_to_numpy(d['mp_time'], dims[0])
-        is_struct = d['np_data'].dtype.type == np.void
+        attach(strm)
+        attach_rings(strm, counters)
+    by_name = {strm['name']: strm for strm in streams}
+    multi = len(streams) > 1 or streams[0]['name'] is not None
+    if trace:
+        trace.bind()
     try:
         priority(1)  # high priority (non-realtime, though) and disables gc
+        if cpus is not None:
+            affinity(cpus)
+        if locked is not None:  # prefault & lock the shared buffers on this side too
+            locked.value = all([lock_segments(segments(strm)) for strm in streams])
         with dev:
+            if health is not None:
+                health.last_sample = clock.get_time()  # stalls count from here
+                stall_after = health.stall_after
+            if status is not None:
+                status.value = RUNNING
             remote_ready.set()  # signal all set to the parent process
             while not kill_remote.is_set() and pid_exists(parent_pid):
+                if trace:
+                    t0 = trace.clock.get_time_ns()
                 # either a (time, data) tuple or list of (time, data) tuples
                 # or None if nothing
+                # (or a dict of those, keyed by stream name)
                 device_dat = dev.read()
-                # t0 = default_timer()
                 if device_dat is None:
+                    if (health is not None and stall_after > 0 and not health.stalled and
+                            clock.get_time() - health.last_sample > stall_after):
+                        health.stalled = True
                     continue  # next read
-                buffer_index = current_buffer_index.value
-                # lock magicks
-                # test whether the current buffer is accessible
-                current_data = data[buffer_index]
-                lck = current_data['lock']
-                success = lck.acquire(block=False)
-                if not success:
-                    current_buffer_index.value = not current_buffer_index.value
-                    buffer_index = not buffer_index
-                    current_data = data[buffer_index]
-                    lck = current_data['lock']
-                    # manual lock handling
-                    lck.acquire()
-                try:
-                    shared_time = current_data['np_time']
-                    shared_data = current_data['np_data']
-                    shared_counter = current_data['counter']
-                    if isinstance(device_dat, list):
-                        for dat in device_dat:
-                            process_data(shared_time, shared_data,
-                                         dat[0], dat[1], shared_counter, is_struct)
-                    else:
-                        process_data(shared_time, shared_data,
-                                     device_dat[0], device_dat[1], shared_counter, is_struct)
-                finally:
-                    lck.release()
-                # print(default_timer() - t0)
-
+                n0 = counters.samples
+                if trace:
+                    # only record reads that produced data, so polling doesn't flood the ring
+                    trace.mark(tr.REMOTE, tr.BEGIN, t0)
+                    trace.mark(tr.DEVICE_READ, tr.BEGIN, t0)
+                    trace.end(tr.DEVICE_READ)
+                if multi:
+                    for name, dat in device_dat.items():
+                        if dat is not None:
+                            commit(by_name[name], dat, counters, trace)
+                else:
+                    commit(streams[0], device_dat, counters, trace)
+                if health is not None:
+                    update_health(health, clock.get_time(), counters.samples - n0)
+                if trace:
+                    trace.end(tr.REMOTE)
+    except BaseException:
+        if status is not None:
+            status.value = ERRORED
+        raise
     finally:
+        if status is not None and status.value != ERRORED:
+            status.value = STOPPED
         priority(0)
         remote_ready.set()
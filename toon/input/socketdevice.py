@@ -0,0 +1,160 @@
+import select
+import socket
+
+import numpy as np
+
+from toon.input.device import BaseDevice
+
+
+class SocketDevice(BaseDevice):
+    """Base class for devices streaming fixed-layout packets over a local socket
+    (e.g. motion capture or eye trackers).
+
+    Packets are received with `recv_into` straight into a preallocated buffer, viewed
+    as an array of `packet_dtype` (no intermediate bytes objects), and each `read()`
+    drains everything available and returns it as a block.
+
+    Attributes
+    ----------
+    packet_dtype: numpy dtype
+        Layout of one packet.
+    length_prefix: numpy dtype, optional
+        For TCP, the dtype of a length field preceding every packet (e.g. '>u4'), if the
+        stream is framed that way. The length must match the size of `packet_dtype`.
+    max_packets: int
+        Most packets to drain per `read()`.
+    timeout: float
+        If `blocking`, how long (in seconds) to wait for data.
+
+    Notes
+    -----
+    With UDP, each datagram holds one packet. Shorter datagrams are dropped (see `self.dropped`),
+    and longer ones are truncated.
+    """
+    packet_dtype = None
+    length_prefix = None
+    max_packets = 256
+    timeout = 0.1
+
+    def __init__(self, address=('127.0.0.1', 0), protocol='udp', blocking=True, **kwargs):
+        """Create a new SocketDevice.
+
+        Parameters
+        ----------
+        address: tuple
+            (host, port) to listen on (UDP) or connect to (TCP).
+        protocol: str
+            'udp' or 'tcp'.
+        blocking: bool
+            Wait up to `timeout` seconds for data in `read()`.
+        """
+        super(SocketDevice, self).__init__(**kwargs)
+        if protocol not in ('udp', 'tcp'):
+            raise ValueError("protocol must be 'udp' or 'tcp', not %r." % protocol)
+        self.address = address
+        self.protocol = protocol
+        self.blocking = blocking
+        self.sock = None
+        self.dropped = 0
+        self.packet_dtype = np.dtype(self.packet_dtype)
+        if self.length_prefix is not None:
+            self.length_prefix = np.dtype(self.length_prefix)
+            self._frame_dtype = np.dtype([('length', self.length_prefix),
+                                          ('packet', self.packet_dtype)])
+        else:
+            self._frame_dtype = self.packet_dtype
+        self.frame_size = self._frame_dtype.itemsize
+        # one extra frame of room, so partial frames (TCP) can wait for the rest
+        self._buf = bytearray(self.frame_size * (self.max_packets + 1))
+        self._view = memoryview(self._buf)
+        self._fill = 0  # bytes in the buffer (TCP)
+        self._times = np.empty(self.max_packets + 1)
+
+    def enter(self):
+        if self.protocol == 'udp':
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+            self.sock.bind(self.address)
+        else:
+            self.sock = socket.create_connection(self.address, timeout=1)
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.sock.setblocking(False)
+        self._fill = 0
+
+    def exit(self):
+        self.sock.close()
+
+    def decode(self, packets):
+        """Convert a 1D array of `packet_dtype` to a block of observations (one row per packet).
+
+        Notes
+        -----
+        `packets` is a view of the receive buffer, and is only valid until the next `read()`.
+        The default returns it as-is (MpDevice copies it into shared memory right away).
+        """
+        return packets
+
+    def _wait(self):
+        return bool(select.select([self.sock], [], [], self.timeout)[0])
+
+    def _read_datagrams(self):
+        size = self.frame_size
+        view = self._view
+        times = self._times
+        n = 0
+        while n < self.max_packets:
+            try:
+                nbytes = self.sock.recv_into(view[n * size:(n + 1) * size], size)
+            except BlockingIOError:
+                break
+            if nbytes != size:
+                self.dropped += 1
+                continue
+            times[n] = self.clock()
+            n += 1
+        return n
+
+    def _read_stream(self):
+        size = self.frame_size
+        view = self._view
+        times = self._times
+        done = self._fill // size
+        while done < self.max_packets:
+            try:
+                nbytes = self.sock.recv_into(view[self._fill:], len(self._buf) - self._fill)
+            except BlockingIOError:
+                break
+            if not nbytes:
+                raise ConnectionError('Connection closed by %s:%i.' % self.address)
+            self._fill += nbytes
+            # packets completed by this chunk arrived now
+            total = min(self._fill // size, self.max_packets)
+            times[done:total] = self.clock()
+            done = total
+        return done
+
+    def read(self):
+        # (a TCP stream may still have complete packets buffered from last time)
+        if self.blocking and self._fill < self.frame_size and not self._wait():
+            return None
+        if self.protocol == 'udp':
+            n = self._read_datagrams()
+        else:
+            n = self._read_stream()
+        if not n:
+            return None
+        frames = np.frombuffer(self._buf, dtype=self._frame_dtype, count=n)
+        times = self._times[:n].copy()
+        if self.protocol == 'tcp':
+            used = n * self.frame_size
+            rest = self._fill - used
+            if rest:
+                # move the partial packet to the front (copying the complete ones out first)
+                frames = frames.copy()
+                self._buf[:rest] = self._buf[used:self._fill]
+            self._fill = rest
+        if self.length_prefix is not None:
+            if np.any(frames['length'] != self.packet_dtype.itemsize):
+                raise ValueError('Unexpected packet length in stream from %s:%i.' % self.address)
+            frames = frames['packet']
+        return times, self.decode(frames)
@@ -0,0 +1,135 @@
+import ctypes
+import json
+import multiprocessing as mp
+import os
+
+import numpy as np
+
+from toon.util import mono_clock
+
+# event names, stored as small integers in the ring
+REMOTE = 0  # one pass of the remote loop that produced data
+DEVICE_READ = 1  # dev.read() on the child
+LOCK = 2  # lock acquisition on the child
+FLIP = 3  # buffer flip on the child (instant)
+PROCESS_DATA = 4  # commit of the data from one dev.read()
+READ = 5  # MpDevice.read() on the parent
+READ_LOCK = 6  # lock acquisition on the parent
+READ_COPY = 7  # copy out of shared memory on the parent
+
+names = ('remote', 'device_read', 'lock', 'flip', 'process_data',
+         'read', 'read_lock', 'read_copy')
+
+BEGIN = 0
+END = 1
+INSTANT = 2
+_phases = ('B', 'E', 'i')
+
+
+class TraceRing(object):
+    """Preallocated ring of timestamped events living in shared memory.
+
+    Each process writes to its own ring, so no locking is needed. Timestamps come from
+    `toon.util.mono_clock`, which shares its reference time with child processes.
+    """
+
+    def __init__(self, size=65536):
+        """Create a new TraceRing.
+
+        Parameters
+        ----------
+        size: int, optional
+            Number of events to keep. Once full, the oldest events are overwritten.
+        """
+        self.size = int(size)
+        self._times = mp.RawArray(ctypes.c_uint64, self.size)
+        self._events = mp.RawArray(ctypes.c_uint8, self.size)
+        self._phases = mp.RawArray(ctypes.c_uint8, self.size)
+        self._index = mp.RawValue(ctypes.c_uint64, 0)
+        self._pid = mp.RawValue(ctypes.c_int64, os.getpid())
+        self.clock = mono_clock
+
+    def bind(self):
+        """Claim the ring for the calling process (and reset it)."""
+        self._pid.value = os.getpid()
+        self._index.value = 0
+
+    def mark(self, event, phase, t=None):
+        """Record an event.
+
+        Parameters
+        ----------
+        event: int
+            One of the event constants in this module (e.g. `READ`).
+        phase: int
+            `BEGIN`, `END`, or `INSTANT`.
+        t: int, optional
+            Timestamp in nanoseconds. Defaults to now.
+        """
+        if t is None:
+            t = self.clock.get_time_ns()
+        index = self._index.value
+        i = index % self.size
+        self._times[i] = t
+        self._events[i] = event
+        self._phases[i] = phase
+        self._index.value = index + 1
+
+    def begin(self, event):
+        self.mark(event, BEGIN)
+
+    def end(self, event):
+        self.mark(event, END)
+
+    def instant(self, event):
+        self.mark(event, INSTANT)
+
+    def events(self):
+        """Return (times, events, phases) arrays in chronological order."""
+        index = self._index.value
+        times = np.frombuffer(self._times, dtype=np.uint64)
+        events = np.frombuffer(self._events, dtype=np.uint8)
+        phases = np.frombuffer(self._phases, dtype=np.uint8)
+        if index <= self.size:
+            order = np.arange(index)
+        else:
+            order = np.roll(np.arange(self.size), -(index % self.size))
+        return times[order], events[order], phases[order]
+
+    def to_chrome(self):
+        """Convert the ring contents into a list of Chrome trace events."""
+        pid = self._pid.value
+        out = []
+        for t, ev, ph in zip(*self.events()):
+            entry = {'name': names[ev], 'ph': _phases[ph],
+                     'ts': int(t) / 1000.0,  # microseconds
+                     'pid': pid, 'tid': pid}
+            if ph == INSTANT:
+                entry['s'] = 't'
+            out.append(entry)
+        return out
+
+
+def export_chrome(rings, path=None):
+    """Merge one or more TraceRings into the Chrome trace JSON format.
+    The result can be loaded into chrome://tracing or https://ui.perfetto.dev.
+
+    Parameters
+    ----------
+    rings: list of TraceRing
+    path: str, optional
+        If provided, also write the JSON to this file.
+
+    Returns
+    -------
+    Dictionary in the Chrome trace event format.
+    """
+    events = []
+    for ring in rings:
+        events.extend(ring.to_chrome())
+    events.sort(key=lambda e: e['ts'])
+    trace = {'traceEvents': events, 'displayTimeUnit': 'ns'}
+    if path is not None:
+        with open(path, 'w') as f:
+            json.dump(trace, f)
+    return trace
@@ -1,2 +1,2 @@
-from toon.util.priority import priority
+from toon.util.priority import priority, affinity
 from toon.util.clock import MonoClock, mono_clock
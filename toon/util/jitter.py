@@ -0,0 +1,104 @@
+"""Measure scheduling jitter (in the spirit of cyclictest).
+
+A loop sleeps until the next tick of a fixed period and records how late it woke up.
+Run as a script to survey all `priority` levels, with and without garbage collection:
+
+    python -m toon.util.jitter --period 0.001 --duration 5 --cpus 3
+"""
+import gc
+from collections import namedtuple
+from time import sleep
+
+import numpy as np
+
+from toon.util.clock import mono_clock
+from toon.util.priority import priority, affinity
+
+jitter = namedtuple('jitter', ['level', 'gc', 'cpus', 'lateness', 'percentiles', 'histogram'])
+
+percentile_levels = (50, 90, 99, 99.9, 100)
+
+
+def measure_jitter(period=1e-3, duration=1.0, level=0, gc_enabled=False, cpus=None,
+                   allocate=0, bins=50):
+    """Run a periodic loop and record how late each wake-up is.
+
+    Parameters
+    ----------
+    period: float
+        Loop period, in seconds.
+    duration: float
+        How long to run, in seconds.
+    level: int
+        `priority` level to run at (the previous state is not restored; we drop back to 0).
+    gc_enabled: bool
+        Re-enable garbage collection after setting the priority (which disables it for level > 0).
+    cpus: iterable of int, optional
+        Pin the calling process to these CPUs while measuring.
+    allocate: int
+        Number of reference cycles to create each iteration, to give the garbage collector work.
+    bins: int
+        Number of histogram bins.
+
+    Returns
+    -------
+    Named tuple with fields:
+
+    - level, gc, cpus: The configuration.
+    - lateness: Array of wake-up lateness per iteration, in microseconds.
+    - percentiles: Dictionary mapping percentile (50, 90, 99, 99.9, 100) to lateness (microseconds).
+    - histogram: (counts, bin_edges) of the lateness, bin edges in microseconds.
+    """
+    n = max(int(duration / period), 1)
+    period_ns = int(period * 1e9)
+    lateness = np.zeros(n, dtype=np.int64)  # preallocated, so the loop doesn't allocate
+    get_time_ns = mono_clock.get_time_ns
+    old_cpus = affinity()
+    try:
+        if cpus is not None:
+            cpus = affinity(cpus)
+        priority(level)
+        if gc_enabled:
+            gc.enable()
+        else:
+            gc.disable()
+        target = get_time_ns() + period_ns
+        for i in range(n):
+            for j in range(allocate):
+                cycle = []
+                cycle.append(cycle)
+            remaining = target - get_time_ns()
+            if remaining > 0:
+                sleep(remaining * 1e-9)
+            lateness[i] = get_time_ns() - target
+            target += period_ns
+    finally:
+        priority(0)
+        if cpus is not None and old_cpus is not None:
+            affinity(old_cpus)
+    lateness = lateness * 1e-3
+    pct = dict(zip(percentile_levels, np.percentile(lateness, percentile_levels)))
+    return jitter(level, gc_enabled, cpus, lateness, pct, np.histogram(lateness, bins=bins))
+
+
+def survey(levels=(0, 1, 2), gcs=(True, False), **kwargs):
+    """Run `measure_jitter` for each combination of priority level and gc state.
+    Extra keyword arguments are passed along to `measure_jitter`."""
+    return [measure_jitter(level=lvl, gc_enabled=g, **kwargs) for lvl in levels for g in gcs]
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Measure scheduling jitter at each priority level.')
+    parser.add_argument('--period', type=float, default=1e-3, help='loop period (s)')
+    parser.add_argument('--duration', type=float, default=5.0, help='duration of each run (s)')
+    parser.add_argument('--cpus', type=int, nargs='*', help='CPUs to pin to')
+    parser.add_argument('--allocate', type=int, default=0,
+                        help='reference cycles to create per iteration')
+    args = parser.parse_args()
+
+    print('level  gc     ' + ''.join('%12s' % ('p%s (us)' % p) for p in percentile_levels))
+    for res in survey(period=args.period, duration=args.duration,
+                      cpus=args.cpus, allocate=args.allocate):
+        print('%-6i %-6s ' % (res.level, res.gc) +
+              ''.join('%12.1f' % res.percentiles[p] for p in percentile_levels))
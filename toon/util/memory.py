@@ -0,0 +1,178 @@
+import ctypes
+import mmap
+import os
+from sys import platform
+
+import numpy as np
+import psutil
+
+PAGESIZE = mmap.PAGESIZE
+# (address, length) of every region locked with `lock()`, so they can be re-locked
+# after something unlocks the whole address space (see `relock()`)
+_locked_regions = set()
+
+
+def _region(buf):
+    """Page-aligned (address, length) covering a ctypes object."""
+    addr = ctypes.addressof(buf)
+    start = addr - addr % PAGESIZE
+    end = addr + ctypes.sizeof(buf)
+    length = end - start
+    length += -length % PAGESIZE
+    return start, length
+
+
+def prefault(buf):
+    """Touch every page of a ctypes object (e.g. a `multiprocessing.RawArray`), so
+    the calling process doesn't take page faults the first time it is accessed.
+
+    Notes
+    -----
+    Pages are written back with their current value, so don't call this while another
+    process may be writing to the buffer.
+    """
+    arr = np.frombuffer(buf, dtype=np.uint8)
+    if arr.size == 0:
+        return
+    offset = -ctypes.addressof(buf) % PAGESIZE
+    arr[offset::PAGESIZE] |= 0
+    arr[:1] |= 0  # first (possibly partial) page
+
+
+if platform == 'win32':
+    kernel32 = None
+    try:
+        kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+    except Exception:
+        pass
+
+    def lock(buf):
+        """Lock the pages of a ctypes object into RAM. Returns True on success."""
+        if kernel32 is None:
+            return False
+        addr, length = _region(buf)
+        if kernel32.VirtualLock(ctypes.c_void_p(addr), ctypes.c_size_t(length)):
+            _locked_regions.add((addr, length))
+            return True
+        return False
+
+    def unlock(buf):
+        if kernel32 is None:
+            return False
+        addr, length = _region(buf)
+        _locked_regions.discard((addr, length))
+        return bool(kernel32.VirtualUnlock(ctypes.c_void_p(addr), ctypes.c_size_t(length)))
+
+    def relock():
+        """Lock all regions previously locked with `lock()` again. Returns True on success."""
+        if kernel32 is None:
+            return False
+        return all([bool(kernel32.VirtualLock(ctypes.c_void_p(addr), ctypes.c_size_t(length)))
+                    for addr, length in _locked_regions])
+
+    def advise_huge_pages(buf):
+        """Ask the OS to back a ctypes object with huge pages (Linux only)."""
+        return False
+
+else:
+    import ctypes.util
+
+    MADV_HUGEPAGE = 14  # linux/mman.h
+
+    libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+    libc.mlock.argtypes = (ctypes.c_void_p, ctypes.c_size_t)
+    libc.munlock.argtypes = (ctypes.c_void_p, ctypes.c_size_t)
+    libc.madvise.argtypes = (ctypes.c_void_p, ctypes.c_size_t, ctypes.c_int)
+
+    def lock(buf):
+        """Lock the pages of a ctypes object into RAM. Returns True on success.
+
+        Notes
+        -----
+        This is subject to RLIMIT_MEMLOCK (see the `priority` notes in the README).
+        """
+        addr, length = _region(buf)
+        if libc.mlock(addr, length) == 0:
+            _locked_regions.add((addr, length))
+            return True
+        return False
+
+    def unlock(buf):
+        addr, length = _region(buf)
+        _locked_regions.discard((addr, length))
+        return libc.munlock(addr, length) == 0
+
+    def relock():
+        """Lock all regions previously locked with `lock()` again (e.g. after `munlockall`,
+        which `priority` calls when dropping from level 2). Returns True on success."""
+        return all([libc.mlock(addr, length) == 0 for addr, length in _locked_regions])
+
+    def advise_huge_pages(buf):
+        """Ask the OS to back a ctypes object with (transparent) huge pages. Returns True
+        if the kernel accepted the advice.
+
+        Notes
+        -----
+        Linux only. Shared memory additionally needs
+        /sys/kernel/mm/transparent_hugepage/shmem_enabled set to `advise` (or `always`).
+        """
+        if not platform.startswith('linux'):
+            return False
+        addr, length = _region(buf)
+        return libc.madvise(addr, length, MADV_HUGEPAGE) == 0
+
+
+def page_faults(pid=None):
+    """Number of (minor, major) page faults taken by a process so far.
+
+    Parameters
+    ----------
+    pid: int, optional
+        Defaults to the calling process.
+
+    Returns
+    -------
+    Tuple of (minor, major) faults, or None if unavailable. On Windows, all faults
+    are reported as minor.
+    """
+    pid = os.getpid() if pid is None else pid
+    if platform == 'win32':
+        try:
+            return psutil.Process(pid).memory_info().num_page_faults, 0
+        except psutil.Error:
+            return None
+    try:
+        with open('/proc/%i/stat' % pid) as f:
+            # the command name may contain spaces, so split after it
+            fields = f.read().rsplit(')', 1)[1].split()
+        return int(fields[7]), int(fields[9])
+    except (OSError, IndexError, ValueError):
+        pass
+    if pid == os.getpid():
+        import resource
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        return usage.ru_minflt, usage.ru_majflt
+    return None
+
+
+def locked_bytes(pid=None):
+    """Amount of memory a process has locked into RAM (VmLck), in bytes.
+
+    Parameters
+    ----------
+    pid: int, optional
+        Defaults to the calling process.
+
+    Returns
+    -------
+    int, or None if unavailable (e.g. not on Linux).
+    """
+    pid = os.getpid() if pid is None else pid
+    try:
+        with open('/proc/%i/status' % pid) as f:
+            for line in f:
+                if line.startswith('VmLck:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, IndexError, ValueError):
+        pass
+    return None
@@ -4,6 +4,36 @@ import gc
 import warnings
 from sys import platform
 
+import psutil
+
+from toon.util import memory
+
+
+def affinity(cpus=None, pid=None):
+    """Get (and optionally set) the CPUs a process may run on.
+
+    Parameters
+    ----------
+    cpus: iterable of int, optional
+        CPU indices to pin the process to. If None, the affinity is left alone.
+    pid: int, optional
+        Process to modify. Defaults to the calling process.
+
+    Returns
+    -------
+    Sorted list of CPUs the process is allowed to run on, or None if the platform
+    doesn't support CPU affinity (e.g. MacOS).
+    """
+    proc = psutil.Process(pid)
+    if not hasattr(proc, 'cpu_affinity'):
+        if cpus is not None:
+            warnings.warn('CPU affinity is not supported on this platform.')
+        return None
+    if cpus is not None:
+        proc.cpu_affinity(sorted(set(cpus)))
+    return sorted(proc.cpu_affinity())
+
+
 if platform == 'win32':
     kernel32 = None
     avrt = None
@@ -116,11 +146,22 @@ else:  # linux
     MCL_FUTURE = 2
 
     libc = ctypes.CDLL(ctypes.util.find_library('c'))
+    _all_locked = False  # whether we called mlockall
+
+    def _unlock_all():
+        global _all_locked
+        # munlockall also undoes any regions locked individually (e.g. MpDevice's
+        # shared buffers), so lock those again
+        libc.munlockall()
+        _all_locked = False
+        memory.relock()
 
     def priority(level=0, pid=0):
+        global _all_locked
         gc.disable() if level > 0 else gc.enable()
 
-        libc.munlockall()
+        if _all_locked and level < 2:
+            _unlock_all()
         if level == 1:
             policy = os.SCHED_RR
         elif level >= 2:
@@ -138,7 +179,9 @@ else:  # linux
         # try to lock memory (and we succeeded in sched already)
         if level >= 2:
             res = libc.mlockall(MCL_CURRENT | MCL_FUTURE)
-            if res != 0:
-                libc.munlockall()
+            if res == 0:
+                _all_locked = True
+            else:
+                _unlock_all()
 
         return True